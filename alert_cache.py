@@ -1,25 +1,167 @@
+import heapq
+import json
+import logging
 import os
+import threading
 import time
 
+import asyncio
 from dotenv import load_dotenv
 
+from metrics import metrics
+
 load_dotenv()
 
-_recent_alerts = {}
+log = logging.getLogger(__name__)
 
 ALERT_COOLDOWN_MINUTES = int(os.getenv("ALERT_COOLDOWN_MINUTES", 30))
 ALERT_COOLDOWN = ALERT_COOLDOWN_MINUTES * 60
+ALERT_CACHE_MAX_SIZE = int(os.getenv("ALERT_CACHE_MAX_SIZE", 10000))                  # entries kept, soonest to expire evicted first
+ALERT_REFIRE_GROWTH_PERCENT = float(os.getenv("ALERT_REFIRE_GROWTH_PERCENT", 50))     # spread growth that re-alerts within the cooldown, 0 disables
+ALERT_CACHE_FILE = os.getenv("ALERT_CACHE_FILE", "")                                  # snapshot file reloaded on start, empty disables
+ALERT_CACHE_SAVE_INTERVAL = float(os.getenv("ALERT_CACHE_SAVE_INTERVAL", 10))          # seconds between snapshots while alerts are accepted
 
 def _make_key(data):
     return f"{data['token']}:{data['sortBy']}:{data['feeds'][0]['feed']}:{data['feeds'][-1]['feed']}"
 
+SPREAD_FIELDS = {"price": "priceDiffPct", "funding": "funding24RateDiffPct", "carry": "carryDiffPct", "executable": "sellDiffPct"}
 
-def should_send_alert(data):
-    key = _make_key(data)
-    now = time.time()
-    last_sent = _recent_alerts.get(key)
+def spread_percent(data):
+    """Largest difference in the alert's own metric, in percent."""
+    if "spreadPct" in data:
+        return abs(data["spreadPct"])
+    field = SPREAD_FIELDS[data["sortBy"]]
+    return max(abs(feed[field]) for feed in data["feeds"])
+
+class AlertCache:
+    """
+    Alert deduplication with expiry.
+
+    An alert key (token, metric, highest and lowest feed) is remembered for `cooldown`
+    seconds together with the spread it was sent at. Within the cooldown the same key is
+    suppressed unless its spread grew by refire_growth_percent since the last alert.
+
+    Entries expire through a heap ordered by expiry time and the cache never holds more
+    than max_size of them, the soonest to expire are evicted first. With a snapshot
+    path, entries are reloaded on start, so a restart does not re-send everything still
+    in cooldown. run() saves them every save_interval seconds after alerts were
+    accepted, writing from a worker thread so an alert burst never waits on disk, and
+    save() writes the last changes on shutdown.
+    """
+
+    def __init__(
+        self,
+        cooldown=ALERT_COOLDOWN,
+        max_size=ALERT_CACHE_MAX_SIZE,
+        refire_growth_percent=ALERT_REFIRE_GROWTH_PERCENT,
+        path=ALERT_CACHE_FILE,
+        save_interval=ALERT_CACHE_SAVE_INTERVAL,
+    ):
+        self.cooldown = cooldown
+        self.max_size = max_size
+        self.refire_growth = refire_growth_percent / 100
+        self.path = path
+        self.save_interval = save_interval
+        self.changed = False               # entries accepted since the last snapshot
+        self.write_lock = threading.Lock()  # a shutdown save() can overlap a background write
+        self.entries = {}                  # key -> (expires_at, spread)
+        self.expiry = []                   # heap of (expires_at, key), may hold superseded items
+        self.accepted = 0
+        self.suppressed = 0
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _prune(self, now):
+        while self.expiry and (self.expiry[0][0] <= now or len(self.entries) > self.max_size):
+            expires_at, key = heapq.heappop(self.expiry)
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == expires_at:
+                del self.entries[key]
+
+    def _remember(self, key, expires_at, spread):
+        self.entries[key] = (expires_at, spread)
+        heapq.heappush(self.expiry, (expires_at, key))
+        # Superseded heap items are only dropped when they surface; rebuild before they pile up
+        if len(self.expiry) > 2 * max(len(self.entries), self.max_size):
+            self.expiry = [(expires_at, key) for key, (expires_at, _) in self.entries.items()]
+            heapq.heapify(self.expiry)
+
+    def should_send(self, data, now=None):
+        now = time.time() if now is None else now
+        self._prune(now)
+        key = _make_key(data)
+        spread = spread_percent(data)
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            _, last_spread = entry
+            if not self.refire_growth or spread < last_spread * (1 + self.refire_growth):
+                self.suppressed += 1
+                return False
 
-    if last_sent is None or now - last_sent > ALERT_COOLDOWN:
-        _recent_alerts[key] = now
+        self._remember(key, now + self.cooldown, spread)
+        self._prune(now)
+        self.accepted += 1
+        self.changed = True
         return True
-    return False
+
+    def _write(self, entries):
+        tmp_path = f"{self.path}.tmp"
+        with self.write_lock:
+            try:
+                with open(tmp_path, "w") as file:
+                    json.dump(entries, file)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                log.error("❌ Failed to save alert cache to %s: %s", self.path, e)
+
+    def save(self):
+        """Write the snapshot now if entries changed since the last one."""
+        if not self.path or not self.changed:
+            return
+        self.changed = False
+        self._write(self.entries)
+
+    async def run(self):
+        """Save a snapshot every save_interval seconds while entries change."""
+        if not self.path:
+            return
+        while True:
+            await asyncio.sleep(self.save_interval)
+            if not self.changed:
+                continue
+            self.changed = False
+            await asyncio.to_thread(self._write, dict(self.entries))
+
+    def load(self):
+        try:
+            with open(self.path) as file:
+                entries = json.load(file)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            log.error("❌ Failed to load alert cache from %s: %s", self.path, e)
+            return
+        now = time.time()
+        for key, (expires_at, spread) in entries.items():
+            if expires_at > now:
+                self._remember(key, expires_at, spread)
+        self._prune(now)
+
+_alert_cache = AlertCache()
+
+metrics.collect("alerts_accepted_total", "counter", "Alerts let through by the cooldown cache", lambda: [({}, _alert_cache.accepted)])
+metrics.collect("alerts_suppressed_total", "counter", "Alerts suppressed by the cooldown cache", lambda: [({}, _alert_cache.suppressed)])
+metrics.collect("alert_cache_entries", "gauge", "Alert keys in cooldown", lambda: [({}, len(_alert_cache))])
+
+def should_send_alert(data):
+    return _alert_cache.should_send(data)
+
+def run_alert_cache():
+    return _alert_cache.run()
+
+def save_alert_cache():
+    _alert_cache.save()
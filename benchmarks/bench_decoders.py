@@ -0,0 +1,55 @@
+"""
+Microbenchmark JSON decoding of each exchange's ticker frames.
+
+Compares stdlib json, orjson, generic msgspec and the typed msgspec decoder built
+from each feed's message_schema (whichever of those are installed).
+
+Run from the repository root:
+    python -m benchmarks.bench_decoders
+"""
+import json
+import timeit
+
+import json_decoder
+from asterdex_feed import AsterdexFeed
+from edgex_feed import EdgexFeed
+from extended_feed import ExtendedFeed
+from gate_feed import GateFeed
+from hyperliquid_feed import HyperliquidFeed
+from lighter_feed import LighterFeed
+from mexc_feed import MexcFeed
+
+from benchmarks.payloads import sample_frames
+
+FEED_CLASSES = [AsterdexFeed, HyperliquidFeed, MexcFeed, GateFeed, EdgexFeed, LighterFeed, ExtendedFeed]
+REPEAT = 5
+MIN_SECONDS = 0.2
+
+def decoders(schema):
+    candidates = {"json": json.loads}
+    if json_decoder.orjson:
+        candidates["orjson"] = json_decoder.orjson.loads
+    if json_decoder.msgspec:
+        candidates["msgspec"] = json_decoder.msgspec.json.Decoder().decode
+        if schema is not None:
+            candidates["msgspec typed"] = json_decoder.msgspec.json.Decoder(schema).decode
+    return candidates
+
+def bench(decode, frame):
+    number = 1
+    while timeit.timeit(lambda: decode(frame), number=number) < MIN_SECONDS:
+        number *= 2
+    best = min(timeit.repeat(lambda: decode(frame), number=number, repeat=REPEAT))
+    return number / best
+
+def main():
+    print(f"Active backend: {json_decoder.BACKEND}")
+    for feed_class in FEED_CLASSES:
+        frame = sample_frames(feed_class.name)[0].encode()
+        results = {name: bench(decode, frame) for name, decode in decoders(feed_class.message_schema).items()}
+        baseline = results["json"]
+        row = ", ".join(f"{name} {rate:,.0f}/s ({rate / baseline:.1f}x)" for name, rate in results.items())
+        print(f"{feed_class.name:<9} {len(frame) / 1024:7.1f} KiB frame: {row}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark the vectorized diff engine against the previous per-token loop.
+
+Run from the repository root:
+    python -m benchmarks.bench_diffs
+"""
+import random
+import timeit
+
+import numpy as np
+
+from diffs import find_funding_diff_table, find_price_diff_table
+from state_store import MarketStateStore
+
+EXCHANGES = ["aster", "hl", "lighter", "edgex", "extended", "mexc", "gate"]
+N_SYMBOLS = 600
+COVERAGE = 0.7                             # chance that an exchange lists a given symbol
+OUTLIERS = 0.03                            # chance that a quote is far off the others
+REPEAT = 20
+
+# --- Previous implementation: one NumPy call per token over dict-of-dict state ---
+def legacy_prepare_diff_data(raw_data):
+    processed_data = {}
+    for feed_name, tokens in raw_data.items():
+        processed_data[feed_name] = {}
+        for symbol, info in tokens.items():
+            price = info.get("price")
+            funding_rate = info.get("funding_rate")
+            interval = info.get("funding_interval_hours")
+
+            if price is None or funding_rate is None or interval is None or interval == 0:
+                continue
+
+            processed_data[feed_name][symbol] = {
+                "price": price,
+                "funding24hRate": funding_rate * (24 / interval)
+            }
+    return processed_data
+
+def legacy_calculate_diffs_numpy(token, feeds, sort_by="price"):
+    feed_names = [f["feed"] for f in feeds]
+    prices = np.array([f.get("price", 0) for f in feeds], dtype=float)
+    fundings = np.array([f.get("funding24hRate", 0) for f in feeds], dtype=float)
+
+    ref_idx = np.argmax(prices) if sort_by == "price" else np.argmax(fundings)
+    ref_price = prices[ref_idx]
+    ref_funding = fundings[ref_idx]
+
+    price_diff = ref_price - prices
+    price_diff_pct = (price_diff / ref_price * 100) if ref_price else np.zeros_like(prices)
+    funding_diff = ref_funding - fundings
+    funding_diff_pct = abs(funding_diff) * 100
+
+    detailed = []
+    for i, feed_name in enumerate(feed_names):
+        detailed.append({
+            "feed": feed_name,
+            "price": round(prices[i], 8),
+            "priceDiff": round(price_diff[i], 8),
+            "priceDiffPct": round(price_diff_pct[i], 2),
+            "funding24hRate": round(fundings[i], 8),
+            "funding24RateDiff": round(funding_diff[i], 8),
+            "funding24RateDiffPct": round(funding_diff_pct[i], 2),
+        })
+    return {"token": token, "sortBy": sort_by, "feeds": detailed}
+
+def legacy_find_table(raw_data, threshold_percent, sort_by):
+    data = legacy_prepare_diff_data(raw_data)
+    results = []
+    all_tokens = {token for feed in data.values() for token in feed.keys()}
+
+    for token in all_tokens:
+        feeds = []
+        for feed_name, feed_data in data.items():
+            token_data = feed_data.get(token)
+            if token_data:
+                feeds.append({"feed": feed_name, **token_data})
+        if len(feeds) < 2:
+            continue
+
+        diffs = legacy_calculate_diffs_numpy(token, feeds, sort_by=sort_by)
+        if sort_by == "price":
+            prices = np.array([f["price"] for f in feeds])
+            min_price, max_price = np.min(prices), np.max(prices)
+            total = ((max_price - min_price) / min_price * 100) if min_price else 0
+        else:
+            total = max(f["funding24RateDiffPct"] for f in diffs["feeds"])
+
+        if total >= threshold_percent:
+            key = "price" if sort_by == "price" else "funding24hRate"
+            diffs["feeds"] = sorted(diffs["feeds"], key=lambda f: f[key], reverse=True)
+            results.append(diffs)
+    return results
+
+# --- Synthetic market ---
+def build_market(seed=1):
+    rng = random.Random(seed)
+    raw = {name: {} for name in EXCHANGES}
+    store = MarketStateStore(EXCHANGES)
+    for i in range(N_SYMBOLS):
+        symbol = f"SYM{i}"
+        base = rng.uniform(0.001, 50000)
+        for name in EXCHANGES:
+            if rng.random() > COVERAGE:
+                continue
+            outlier = rng.random() < OUTLIERS
+            entry = {
+                "price": base * (rng.uniform(0.97, 1.03) if outlier else rng.uniform(0.999, 1.001)),
+                "funding_rate": rng.uniform(-0.001, 0.001) if outlier else rng.uniform(-0.00002, 0.00002),
+                "funding_interval_hours": rng.choice([1, 4, 8]),
+            }
+            raw[name][symbol] = entry
+            store.update(name, symbol, **entry)
+    return raw, store
+
+def main():
+    raw, store = build_market()
+    for sort_by, threshold, find_table in [
+        ("price", 0.5, find_price_diff_table),
+        ("funding", 0.1, find_funding_diff_table),
+    ]:
+        legacy = legacy_find_table(raw, threshold, sort_by)
+        vectorized = find_table(store, threshold)
+        assert {r["token"] for r in legacy} == {r["token"] for r in vectorized}, f"{sort_by}: flagged tokens differ"
+
+        legacy_s = min(timeit.repeat(lambda: legacy_find_table(raw, threshold, sort_by), number=1, repeat=REPEAT))
+        vectorized_s = min(timeit.repeat(lambda: find_table(store, threshold), number=1, repeat=REPEAT))
+        print(
+            f"{sort_by:<8} {N_SYMBOLS} symbols x {len(EXCHANGES)} exchanges, {len(vectorized)} flagged: "
+            f"per-token {legacy_s * 1000:.2f} ms, vectorized {vectorized_s * 1000:.2f} ms "
+            f"({legacy_s / vectorized_s:.1f}x)"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Offline benchmark suite on recorded or synthetic feed traffic.
+
+    parsers   frames/s and ticks/s through each feed's process_message, ticker and
+              order book frames mixed as payloads.sample_recording records them
+    latency   tick-to-alert percentiles: frames pushed by a local stand-in exchange go
+              through the real stream path (socket reader, frame queue, parser,
+              UpdateBuffer) into SpreadDetector
+    memory    tracemalloc peak and process max RSS while replaying every feed into one store
+
+Synthetic traffic is generated from fixed seeds, so runs are comparable. With
+--recordings the parser and memory sections use recorded files instead.
+
+Run from the repository root:
+    python -m benchmarks.bench_replay [--recordings 'recordings/*.jsonl.gz']
+"""
+import argparse
+import glob
+import heapq
+import json
+import resource
+import time
+import tracemalloc
+from collections import defaultdict
+
+import asyncio
+import numpy as np
+
+from detector import SpreadDetector
+from recorder import read_recordings
+from replay import FEED_CLASSES, ReplayedFeed, recorded_exchanges, replay
+from state_store import MarketStateStore
+from update_buffer import UpdateBuffer
+
+from benchmarks.payloads import N_MARKETS, rest_responses, sample_frames, sample_recording
+from benchmarks.stand_in import StandInExchange
+
+SYNTHETIC_FRAMES = 200                     # ticker frames per exchange for the parser and memory sections
+LATENCY_TICKS = 300                        # diverging frames sent in the latency section
+LATENCY_INTERVAL = 0.01                    # seconds between them
+LATENCY_THRESHOLD = 1.0                    # price difference percent the detector alerts on
+DIVERGENCE = 1.02                          # price multiplier that pushes a symbol over the threshold
+SETTLE_TIME = 0.5                          # seconds given to in-flight frames before measuring
+
+# --- Parsers ---
+async def bench_parser(records):
+    """Return (frames/s, ticks/s) of one feed's parser over its recorded frames."""
+    exchange = records[0]["exchange"]
+    store = MarketStateStore([exchange])
+    updates = UpdateBuffer(store)
+    replayed = ReplayedFeed(FEED_CLASSES[records[0]["feed"]], store, exchange, updates)
+
+    frames = []
+    for record in records:
+        if record["kind"] == "rest":
+            replayed.response(record["what"], record["data"])
+        else:
+            frames.append(record["data"])
+    await replayed.frame(frames[0])  # applies the REST responses before timing
+    updates.flush()
+    received = updates.received
+
+    started = time.perf_counter()
+    for frame in frames:
+        await replayed.frame(frame)
+        updates.flush()
+    elapsed = time.perf_counter() - started
+    return len(frames) / elapsed, (updates.received - received) / elapsed
+
+async def run_parsers(recordings):
+    print("Parsers")
+    for exchange, records in sorted(recordings.items()):
+        frames = sum(record["kind"] == "ws" for record in records)
+        if not frames:
+            continue
+        frames_per_second, ticks_per_second = await bench_parser(records)
+        print(f"  {exchange:<9} {frames:>6} frames: {frames_per_second:>10,.0f} frames/s {ticks_per_second:>12,.0f} ticks/s")
+
+# --- Tick-to-alert latency ---
+def priced_frame(exchange, template, prices):
+    """Re-price a synthetic gate or mexc ticker frame: SYM<i> gets prices[i]."""
+    message = json.loads(template)
+    if exchange == "gate":
+        for item in message["result"]:
+            item["last"] = repr(prices[int(item["contract"][3:-5])])
+    else:
+        for item in message["data"]:
+            item["lastPrice"] = prices[int(item["symbol"][3:-5])]
+    return json.dumps(message)
+
+async def run_latency(ticks, interval):
+    """Diverge one symbol per gate frame against a static mexc book and time each alert."""
+    print(f"Tick-to-alert latency ({ticks} crossings, one frame every {interval * 1000:.0f} ms)")
+    baseline = [1.0 + i for i in range(N_MARKETS)]
+    templates = {exchange: sample_frames(exchange)[0] for exchange in ("gate", "mexc")}
+    frames = []
+    for k in range(ticks):
+        prices = list(baseline)
+        prices[k % N_MARKETS] *= DIVERGENCE
+        frames.append(priced_frame("gate", templates["gate"], prices))
+
+    store = MarketStateStore(["gate", "mexc"])
+    updates = UpdateBuffer(store)
+    tasks = [asyncio.create_task(updates.run())]
+    sent_at = {}
+    latencies = []
+
+    async with StandInExchange() as gate, StandInExchange() as mexc:
+        for exchange, server in (("gate", gate), ("mexc", mexc)):
+            replayed = ReplayedFeed(FEED_CLASSES[exchange], store, exchange, updates)
+            for what, data in rest_responses(exchange).items():
+                replayed.response(what, data)
+            await replayed.feed.refresh_data()
+            replayed.feed.mark_ready()
+            replayed.feed.ws_url = server.url
+            tasks.append(asyncio.create_task(replayed.feed.handle_stream()))
+        await asyncio.wait_for(asyncio.gather(gate.connected.wait(), mexc.connected.wait()), 10)
+
+        for exchange, server in (("gate", gate), ("mexc", mexc)):
+            await server.send(priced_frame(exchange, templates[exchange], baseline))
+        await asyncio.sleep(SETTLE_TIME)
+        store.pop_dirty()
+
+        # Each divergence lasts one frame, so alert on the first tick to time the pipeline itself
+        detector = SpreadDetector(store, price_threshold=LATENCY_THRESHOLD, min_ms=0, min_ticks=0)
+
+        async def collect_alerts():
+            async for _, _, table, _ in detector.crossings():
+                alerted_at = time.perf_counter()
+                for token_data in table:
+                    latencies.append(alerted_at - sent_at[token_data["token"]])
+
+        tasks.append(asyncio.create_task(collect_alerts()))
+        for k, frame in enumerate(frames):
+            sent_at[f"SYM{k % N_MARKETS}"] = await gate.send(frame)
+            await asyncio.sleep(interval)
+        await asyncio.sleep(SETTLE_TIME)
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    if not latencies:
+        print("  no alerts received")
+        return
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+    print(f"  alerts {len(latencies)}/{ticks}: p50 {p50:.2f} ms, p90 {p90:.2f} ms, p99 {p99:.2f} ms, max {max(latencies) * 1000:.2f} ms")
+
+# --- Memory ---
+async def run_memory(records, exchanges):
+    print("Memory")
+    tracemalloc.start()
+    started = time.perf_counter()
+    store = MarketStateStore(exchanges)
+    feeds = await replay(records, store)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    frames = sum(replayed.feed.messages_received for replayed in feeds.values())
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    print(f"  replayed {frames} frames of {len(exchanges)} feeds in {elapsed:.2f}s (traced)")
+    print(f"  traced peak {peak / 2**20:.1f} MiB, process max RSS {max_rss:.1f} MiB, {len(store.symbols)} symbols")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline feed benchmarks.")
+    parser.add_argument("--recordings", help="glob of recorder files, default synthetic traffic")
+    parser.add_argument("--frames", type=int, default=SYNTHETIC_FRAMES, help="synthetic frames per exchange")
+    parser.add_argument("--ticks", type=int, default=LATENCY_TICKS)
+    parser.add_argument("--interval", type=float, default=LATENCY_INTERVAL)
+    args = parser.parse_args()
+
+    if args.recordings:
+        paths = sorted(glob.glob(args.recordings))
+        recordings = defaultdict(list)
+        for record in read_recordings(paths):
+            recordings[record["exchange"]].append(record)
+        await run_parsers(recordings)
+        await run_latency(args.ticks, args.interval)
+        await run_memory(read_recordings(paths), recorded_exchanges(paths))
+    else:
+        recordings = {exchange: sample_recording(exchange, args.frames) for exchange in FEED_CLASSES}
+        await run_parsers(recordings)
+        await run_latency(args.ticks, args.interval)
+        merged = heapq.merge(*recordings.values(), key=lambda record: record["t"])
+        await run_memory(merged, sorted(recordings))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,410 @@
+"""
+Synthetic WebSocket frames shaped like each exchange's full-market ticker pushes and
+per-market order book pushes.
+
+Field sets follow the exchanges' public stream payloads, including the fields the feeds
+never read, so decoder benchmarks pay the same cost as on live traffic.
+"""
+import itertools
+import json
+import random
+
+N_MARKETS = 600
+BOOK_LEVELS = 20                           # levels per side in synthetic depth frames
+BOOK_FRAMES_PER_FRAME = 5                  # book frames recorded after each ticker frame
+
+def _price(rng):
+    return rng.uniform(0.001, 50000)
+
+def _s(value):
+    return f"{value:.8g}"
+
+def aster_frame(rng, n=N_MARKETS):
+    return json.dumps({"stream": "!markPrice@arr", "data": [
+        {
+            "e": "markPriceUpdate",
+            "E": 1760000000000,
+            "s": f"SYM{i}USDT",
+            "p": _s(_price(rng)),
+            "P": _s(_price(rng)),
+            "i": _s(_price(rng)),
+            "r": _s(rng.uniform(-0.001, 0.001)),
+            "T": 1760011200000,
+        }
+        for i in range(n)
+    ]})
+
+def hyperliquid_frame(rng, n=N_MARKETS):
+    mids = {f"SYM{i}": _s(_price(rng)) for i in range(n)}
+    mids.update({f"@{i}": _s(_price(rng)) for i in range(n // 2)})
+    return json.dumps({"channel": "allMids", "data": {"mids": mids}})
+
+def mexc_frame(rng, n=N_MARKETS):
+    return json.dumps({
+        "channel": "push.tickers",
+        "data": [
+            {
+                "symbol": f"SYM{i}_USDT",
+                "lastPrice": _price(rng),
+                "riseFallRate": rng.uniform(-0.1, 0.1),
+                "fairPrice": _price(rng),
+                "indexPrice": _price(rng),
+                "volume24": rng.randint(0, 10**9),
+                "amount24": _price(rng) * 1000,
+                "maxBidPrice": _price(rng),
+                "minAskPrice": _price(rng),
+                "lower24Price": _price(rng),
+                "high24Price": _price(rng),
+                "timestamp": 1760000000000,
+                "bid1": _price(rng),
+                "ask1": _price(rng),
+                "holdVol": rng.randint(0, 10**9),
+                "fundingRate": rng.uniform(-0.001, 0.001),
+                "zone": "UTC+8",
+                "riseFallValue": rng.uniform(-10, 10),
+            }
+            for i in range(n)
+        ],
+        "ts": 1760000000000,
+    })
+
+def gate_frame(rng, n=N_MARKETS):
+    return json.dumps({
+        "time": 1760000000,
+        "time_ms": 1760000000000,
+        "channel": "futures.tickers",
+        "event": "update",
+        "result": [
+            {
+                "contract": f"SYM{i}_USDT",
+                "last": _s(_price(rng)),
+                "change_percentage": _s(rng.uniform(-10, 10)),
+                "funding_rate": _s(rng.uniform(-0.001, 0.001)),
+                "funding_rate_indicative": _s(rng.uniform(-0.001, 0.001)),
+                "mark_price": _s(_price(rng)),
+                "index_price": _s(_price(rng)),
+                "total_size": str(rng.randint(0, 10**9)),
+                "volume_24h": str(rng.randint(0, 10**9)),
+                "quanto_base_rate": "",
+                "volume_24h_btc": _s(_price(rng)),
+                "volume_24h_usd": _s(_price(rng)),
+                "volume_24h_quote": _s(_price(rng)),
+                "volume_24h_settle": _s(_price(rng)),
+                "volume_24h_base": _s(_price(rng)),
+                "low_24h": _s(_price(rng)),
+                "high_24h": _s(_price(rng)),
+            }
+            for i in range(n)
+        ],
+    })
+
+def edgex_frame(rng, n=N_MARKETS):
+    return json.dumps({
+        "type": "quote-event",
+        "channel": "ticker.all",
+        "content": {
+            "channel": "ticker.all",
+            "dataType": "Snapshot",
+            "data": [
+                {
+                    "contractId": str(10000001 + i),
+                    "contractName": f"SYM{i}USD",
+                    "priceChange": _s(rng.uniform(-10, 10)),
+                    "priceChangePercent": _s(rng.uniform(-0.1, 0.1)),
+                    "trades": str(rng.randint(0, 10**6)),
+                    "size": _s(_price(rng)),
+                    "value": _s(_price(rng)),
+                    "high": _s(_price(rng)),
+                    "low": _s(_price(rng)),
+                    "open": _s(_price(rng)),
+                    "close": _s(_price(rng)),
+                    "highTime": "1760000000000",
+                    "lowTime": "1760000000000",
+                    "startTime": "1759913600000",
+                    "endTime": "1760000000000",
+                    "lastPrice": _s(_price(rng)),
+                    "indexPrice": _s(_price(rng)),
+                    "oraclePrice": _s(_price(rng)),
+                    "openInterest": _s(_price(rng)),
+                    "fundingRate": _s(rng.uniform(-0.001, 0.001)),
+                    "fundingTime": "1759996800000",
+                    "nextFundingTime": "1760011200000",
+                }
+                for i in range(n)
+            ],
+        },
+    })
+
+def lighter_frame(rng, n=N_MARKETS):
+    return json.dumps({
+        "channel": "market_stats:all",
+        "market_stats": {
+            str(i): {
+                "market_id": i,
+                "index_price": _s(_price(rng)),
+                "mark_price": _s(_price(rng)),
+                "open_interest": _s(_price(rng)),
+                "last_trade_price": _s(_price(rng)),
+                "current_funding_rate": _s(rng.uniform(-0.1, 0.1)),
+                "funding_rate": _s(rng.uniform(-0.1, 0.1)),
+                "funding_timestamp": 1760000000000,
+                "daily_base_token_volume": _price(rng),
+                "daily_quote_token_volume": _price(rng),
+                "daily_price_low": _price(rng),
+                "daily_price_high": _price(rng),
+                "daily_price_change": rng.uniform(-10, 10),
+            }
+            for i in range(n)
+        },
+        "type": "update/market_stats",
+    })
+
+def extended_frame(rng, n=N_MARKETS):
+    # Extended pushes one market per frame
+    i = rng.randrange(n)
+    return json.dumps({
+        "type": "MP",
+        "data": {"m": f"SYM{i}-USD", "p": _s(_price(rng)), "ts": 1760000000000},
+        "ts": 1760000000000,
+        "seq": rng.randint(0, 10**6),
+    })
+
+FRAMES = {
+    "aster": aster_frame,
+    "hl": hyperliquid_frame,
+    "mexc": mexc_frame,
+    "gate": gate_frame,
+    "edgex": edgex_frame,
+    "lighter": lighter_frame,
+    "extended": extended_frame,
+}
+
+def sample_frames(exchange, count=1, seed=1):
+    rng = random.Random(seed)
+    return [FRAMES[exchange](rng) for _ in range(count)]
+
+# --- Order book frames, one market per frame ---
+def _levels(rng, mid, side, n=BOOK_LEVELS):
+    """[(price, size)] best first; side is -1 for bids, 1 for asks."""
+    step = mid * 0.0001
+    return [(mid + side * step * (k + 1), rng.uniform(0.1, 100)) for k in range(n)]
+
+def aster_book_frame(rng, i, snapshot):
+    mid = _price(rng)
+    (bid, bid_size), (ask, ask_size) = _levels(rng, mid, -1, 1)[0], _levels(rng, mid, 1, 1)[0]
+    return json.dumps({"stream": "!bookTicker", "data": {
+        "e": "bookTicker",
+        "u": rng.randint(0, 10**12),
+        "E": 1760000000000,
+        "T": 1760000000000,
+        "s": f"SYM{i}USDT",
+        "b": _s(bid),
+        "B": _s(bid_size),
+        "a": _s(ask),
+        "A": _s(ask_size),
+    }})
+
+def hyperliquid_book_frame(rng, i, snapshot):
+    mid = _price(rng)
+    return json.dumps({"channel": "l2Book", "data": {
+        "coin": f"SYM{i}",
+        "time": 1760000000000,
+        "levels": [
+            [{"px": _s(price), "sz": _s(size), "n": rng.randint(1, 20)} for price, size in _levels(rng, mid, side)]
+            for side in (-1, 1)
+        ],
+    }})
+
+def mexc_book_frame(rng, i, snapshot):
+    mid = _price(rng)
+    return json.dumps({
+        "channel": "push.depth.full",
+        "data": {
+            "asks": [[price, rng.randint(1, 10**4), rng.randint(1, 20)] for price, _ in _levels(rng, mid, 1)],
+            "bids": [[price, rng.randint(1, 10**4), rng.randint(1, 20)] for price, _ in _levels(rng, mid, -1)],
+            "version": rng.randint(0, 10**10),
+        },
+        "symbol": f"SYM{i}_USDT",
+        "ts": 1760000000000,
+    })
+
+def gate_book_frame(rng, i, snapshot):
+    mid = _price(rng)
+    (bid, _), (ask, _) = _levels(rng, mid, -1, 1)[0], _levels(rng, mid, 1, 1)[0]
+    return json.dumps({
+        "time": 1760000000,
+        "time_ms": 1760000000000,
+        "channel": "futures.book_ticker",
+        "event": "update",
+        "result": {
+            "t": 1760000000000,
+            "u": rng.randint(0, 10**10),
+            "s": f"SYM{i}_USDT",
+            "b": _s(bid),
+            "B": rng.randint(1, 10**4),
+            "a": _s(ask),
+            "A": rng.randint(1, 10**4),
+        },
+    })
+
+def edgex_book_frame(rng, i, snapshot):
+    # A snapshot first, then "Changed" deltas in which a zero size removes the level
+    mid = _price(rng)
+    n = BOOK_LEVELS if snapshot else 3
+    channel = f"depth.{10000001 + i}.15"
+
+    def side(levels):
+        return [{"price": _s(price), "size": "0" if not snapshot and rng.random() < 0.2 else _s(size)} for price, size in levels]
+
+    return json.dumps({
+        "type": "quote-event",
+        "channel": channel,
+        "content": {
+            "channel": channel,
+            "dataType": "Snapshot" if snapshot else "Changed",
+            "data": [{
+                "startVersion": str(rng.randint(0, 10**9)),
+                "endVersion": str(rng.randint(0, 10**9)),
+                "level": 15,
+                "contractId": str(10000001 + i),
+                "contractName": f"SYM{i}USD",
+                "asks": side(_levels(rng, mid, 1, n)),
+                "bids": side(_levels(rng, mid, -1, n)),
+                "depthType": "SNAPSHOT" if snapshot else "CHANGED",
+            }],
+        },
+    })
+
+def lighter_book_frame(rng, i, snapshot):
+    # A snapshot on subscribe, then deltas in which a zero size removes the level
+    mid = _price(rng)
+    n = BOOK_LEVELS if snapshot else 3
+
+    def side(levels):
+        return [{"price": _s(price), "size": "0" if not snapshot and rng.random() < 0.2 else _s(size)} for price, size in levels]
+
+    offset = rng.randint(0, 10**9)
+    return json.dumps({
+        "channel": f"order_book:{i}",
+        "offset": offset,
+        "order_book": {
+            "code": 0,
+            "asks": side(_levels(rng, mid, 1, n)),
+            "bids": side(_levels(rng, mid, -1, n)),
+            "offset": offset,
+        },
+        "type": "subscribed/order_book" if snapshot else "update/order_book",
+    })
+
+BOOK_FRAMES = {
+    "aster": aster_book_frame,
+    "hl": hyperliquid_book_frame,
+    "mexc": mexc_book_frame,
+    "gate": gate_book_frame,
+    "edgex": edgex_book_frame,
+    "lighter": lighter_book_frame,
+}
+
+def sample_book_frames(exchange, count=1, seed=1, n=N_MARKETS):
+    """count book frames for random markets, the first for each market a snapshot; [] where the feed streams no books."""
+    if exchange not in BOOK_FRAMES:
+        return []
+    rng = random.Random(seed)
+    seen = set()
+    frames = []
+    for _ in range(count):
+        i = rng.randrange(n)
+        frames.append(BOOK_FRAMES[exchange](rng, i, i not in seen))
+        seen.add(i)
+    return frames
+
+# --- REST responses the feeds read before their frames mean anything ---
+def rest_responses(exchange, n=N_MARKETS):
+    """{label: decoded body} as fetched by the feed's health check and refresh_data()."""
+    if exchange == "aster":
+        return {
+            "health": {"serverTime": 1760000000000},
+            "info data": {"symbols": [{"symbol": f"SYM{i}USDT", "status": "TRADING"} for i in range(n)]},
+            "funding data": [{"symbol": f"SYM{i}USDT", "fundingIntervalHours": 8} for i in range(n)],
+        }
+    if exchange == "hl":
+        return {
+            "health": {"time": 1760000000000},
+            "meta data": [
+                {"universe": [{"name": f"SYM{i}", "szDecimals": 2, "maxLeverage": 20} for i in range(n)]},
+                [{"funding": "0.0000125", "markPx": "1.0"} for _ in range(n)],
+            ],
+        }
+    if exchange == "mexc":
+        return {
+            "health": {"success": True, "code": 0, "data": 1760000000000},
+            "meta data": {"data": [
+                {"symbol": f"SYM{i}_USDT", "baseCoin": f"SYM{i}", "quoteCoin": "USDT", "state": 0, "isHidden": False, "type": 1, "contractSize": 0.01}
+                for i in range(n)
+            ]},
+            "funding data": {"data": [
+                {"symbol": f"SYM{i}_USDT", "fundingRate": 0.0001, "nextSettleTime": 1760011200000, "collectCycle": 8}
+                for i in range(n)
+            ]},
+        }
+    if exchange == "gate":
+        return {
+            "health": [
+                {
+                    "name": f"SYM{i}_USDT",
+                    "in_delisting": False,
+                    "status": "trading",
+                    "is_pre_market": False,
+                    "last_price": "1.0",
+                    "funding_rate": "0.0001",
+                    "funding_next_apply": 1760011200,
+                    "funding_interval": 28800,
+                    "quanto_multiplier": "0.01",
+                }
+                for i in range(n)
+            ],
+        }
+    if exchange == "edgex":
+        return {
+            "health": {"code": "SUCCESS", "data": {"timeMillis": "1760000000000"}},
+            "meta data": {"data": {"contractList": [
+                {"contractId": str(10000001 + i), "contractName": f"SYM{i}USD", "enableTrade": True, "enableDisplay": True, "enableOpenPosition": True}
+                for i in range(n)
+            ]}},
+        }
+    if exchange == "lighter":
+        return {
+            "health": {"code": 200, "timestamp": 1760000000},
+            "market data": {"order_books": [{"market_id": i, "symbol": f"SYM{i}", "status": "active"} for i in range(n)]},
+        }
+    if exchange == "extended":
+        return {
+            "health": {"status": "OK", "data": [
+                {
+                    "name": f"SYM{i}-USD",
+                    "assetName": f"SYM{i}",
+                    "active": True,
+                    "status": "ACTIVE",
+                    "marketStats": {"markPrice": "1.0", "fundingRate": "0.00001"},
+                }
+                for i in range(n)
+            ]},
+        }
+    raise KeyError(exchange)
+
+def sample_recording(exchange, count, seed=1, start=1760000000.0, interval=0.1, books=BOOK_FRAMES_PER_FRAME):
+    """
+    Records as written by recorder.FeedRecorder: REST responses, then count ticker frames,
+    each followed by `books` order book frames on the feeds that stream books.
+    """
+    records = [
+        {"t": start, "feed": exchange, "exchange": exchange, "kind": "rest", "what": what, "data": data}
+        for what, data in rest_responses(exchange).items()
+    ]
+    book_frames = iter(sample_book_frames(exchange, count * books, seed))
+    for i, frame in enumerate(sample_frames(exchange, count, seed)):
+        t = start + (i + 1) * interval
+        records.append({"t": t, "feed": exchange, "exchange": exchange, "kind": "ws", "data": frame})
+        for k, book_frame in enumerate(itertools.islice(book_frames, books)):
+            records.append({"t": t + (k + 1) * interval / (books + 1), "feed": exchange, "exchange": exchange, "kind": "ws", "data": book_frame})
+    return records
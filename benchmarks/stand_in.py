@@ -0,0 +1,57 @@
+"""
+Local WebSocket server standing in for an exchange stream, so feeds can run their real
+connect/read/parse path offline.
+"""
+import time
+
+import asyncio
+import websockets
+
+class StandInExchange:
+    """
+    Accepts feed connections on 127.0.0.1 and pushes whatever frames it is given to every
+    connected client. Messages from clients (subscriptions, pings) are kept in `received`.
+
+    Usage:
+        async with StandInExchange() as server:
+            feed.ws_url = server.url
+            ...
+            sent_at = await server.send(frame)
+    """
+
+    def __init__(self):
+        self.clients = set()
+        self.received = []
+        self.connected = asyncio.Event()
+        self.server = None
+        self.url = None
+
+    async def __aenter__(self):
+        self.server = await websockets.serve(self._handler, "127.0.0.1", 0, max_size=None)
+        port = next(iter(self.server.sockets)).getsockname()[1]
+        self.url = f"ws://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handler(self, ws):
+        self.clients.add(ws)
+        self.connected.set()
+        try:
+            async for message in ws:
+                self.received.append(message)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.clients.discard(ws)
+            if not self.clients:
+                self.connected.clear()
+
+    async def send(self, frame):
+        """Send frame to every client; return the time.perf_counter() it was handed to the sockets."""
+        sent_at = time.perf_counter()
+        for ws in list(self.clients):
+            await ws.send(frame)
+        return sent_at
@@ -0,0 +1,74 @@
+import time
+from functools import partial
+
+from diffs import find_executable_spread_table, find_funding_carry_table, find_funding_diff_table, find_price_diff_table
+from metrics import metrics
+from spread_tracker import SPREAD_MIN_MS, SPREAD_MIN_TICKS, SpreadTracker
+
+DIFF_SCAN_SECONDS = metrics.histogram("diff_scan_seconds", "Duration of one diff table scan", ("kind", "mode"))
+DIFF_LABELS = {"price": "price", "funding": "24h funding rate", "carry": "funding carry", "executable": "executable"}
+
+def diff_checks(price_threshold=None, funding_threshold=None, carry_threshold=None, tolerance_minutes=0, executable_threshold=None):
+    """[(kind, find_table, threshold)] for every diff with a threshold set."""
+    checks = []
+    if price_threshold is not None:
+        checks.append(("price", find_price_diff_table, price_threshold))
+    if funding_threshold is not None:
+        checks.append(("funding", find_funding_diff_table, funding_threshold))
+    if carry_threshold is not None:
+        checks.append(("carry", partial(find_funding_carry_table, tolerance_minutes=tolerance_minutes), carry_threshold))
+    if executable_threshold is not None:
+        checks.append(("executable", find_executable_spread_table, executable_threshold))
+    return checks
+
+class SpreadDetector:
+    """
+    Event-driven spread detection on top of MarketStateStore.
+
+    Waits for the store's `changed` event, re-evaluates only the dirty rows and feeds
+    the result to one SpreadTracker per check. A spread is reported when it has
+    persisted above the threshold (see spread_tracker.py), again whenever it grows past
+    the re-alert level while open, and with its duration when it closes; one-tick
+    glitches are never reported.
+    """
+
+    def __init__(
+        self,
+        store,
+        price_threshold=None,
+        funding_threshold=None,
+        carry_threshold=None,
+        tolerance_minutes=0,
+        executable_threshold=None,
+        min_ms=SPREAD_MIN_MS,
+        min_ticks=SPREAD_MIN_TICKS,
+        checks=None,
+    ):
+        self.store = store
+        if checks is None:
+            checks = diff_checks(price_threshold, funding_threshold, carry_threshold, tolerance_minutes, executable_threshold)
+        self.checks = checks
+        self.trackers = {kind: SpreadTracker(kind, min_ms, min_ticks) for kind, _, _ in self.checks}
+        self.scan_seconds = {kind: DIFF_SCAN_SECONDS.labels(kind=kind, mode="event") for kind, _, _ in self.checks}
+
+    def evaluate(self, rows, now=None):
+        """Return [(kind, threshold, sustained diff table, closed diff table)] for the given store rows."""
+        evaluated = [self.store.symbols[row] for row in rows]
+        crossings = []
+        for kind, find_table, threshold in self.checks:
+            started = time.perf_counter()
+            table = find_table(self.store, threshold, rows=rows)
+            self.scan_seconds[kind].observe(time.perf_counter() - started)
+            sustained, closed = self.trackers[kind].update(table, evaluated, now)
+            if sustained or closed:
+                crossings.append((kind, threshold, sustained, closed))
+        return crossings
+
+    async def crossings(self):
+        while True:
+            await self.store.changed.wait()
+            rows = self.store.pop_dirty()
+            if len(rows) == 0:
+                continue
+            for crossing in self.evaluate(rows):
+                yield crossing
@@ -1,159 +1,392 @@
+import time
+
 import numpy as np
 from tabulate import tabulate
 
-# --- Middleware: prepare feed data for diff checker ---
-def prepare_diff_data(raw_data):
+# --- Middleware: prepare store matrices for diff checker ---
+def read_store_rows(store, rows=None, now=None):
     """
-    Convert raw feed data to the structure expected by diff checker.
+    Read the state store matrices, optionally restricted to rows, and mark usable entries.
 
-    raw_data: {feed: {token: {"price": float, "funding_rate": float, "funding_interval_hours": float, ...}}}
+    store: MarketStateStore, fields are (symbols x exchanges) matrices with NaN for missing values
+    rows: optional array of row indices to restrict the read to, e.g. store.pop_dirty()
+    now: time the quotes' freshness is judged at, defaults to time.time()
 
     Returns:
-        processed_data: {feed: {token: {"price": float, "funding24hRate": float}}}
+        (symbols, rows, m, valid)
+        valid marks entries that have a price quoted within the exchange's TTL, a funding
+        rate and a non-zero funding interval.
     """
-    processed_data = {}
-    for feed_name, tokens in raw_data.items():
-        processed_data[feed_name] = {}
-        for symbol, info in tokens.items():
-            
-            price = info.get("price")
-            funding_rate = info.get("funding_rate")
-            interval = info.get("funding_interval_hours")
-
-            if price is None or funding_rate is None or interval is None or interval == 0:
-                continue
-
-            funding24hRate = funding_rate * (24 / interval)
-            processed_data[feed_name][symbol] = {
-                "price": price,
-                "funding24hRate": funding24hRate
-            }
-    return processed_data
-
-# --- Core diff calculation using NumPy ---
-def calculate_diffs_numpy(token, feeds, sort_by="price"):
+    now = time.time() if now is None else now
+    symbols, m = store.view()
+    if rows is None:
+        rows = np.arange(len(symbols))
+    else:
+        m = {name: matrix[rows] for name, matrix in m.items()}
+
+    interval = m["funding_interval_hours"]
+    fresh = m["quoted_at"] >= now - store.quote_ttl
+    valid = m["present"] & fresh & ~np.isnan(m["price"]) & ~np.isnan(m["funding_rate"]) & ~np.isnan(interval) & (interval != 0)
+    return symbols, rows, m, valid
+
+def prepare_diff_data(store, rows=None, now=None):
     """
-    Calculate price and funding diffs across feeds for a given token using NumPy.
-    Returns a dict with detailed diff info.
+    Read the state store matrices into the arrays expected by diff checker.
+
+    Returns:
+        (symbols, exchanges, rows, prices, funding24h, valid), see read_store_rows()
     """
-    if not feeds:
-        return {"token": token, "feeds": []}
+    symbols, rows, m, valid = read_store_rows(store, rows, now)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        funding24h = m["funding_rate"] * (24 / m["funding_interval_hours"])
+    return symbols, store.exchanges, rows, m["price"], funding24h, valid
 
-    feed_names = [f["feed"] for f in feeds]
-    prices = np.array([f.get("price", 0) for f in feeds], dtype=float)
-    fundings = np.array([f.get("funding24hRate", 0) for f in feeds], dtype=float)
+# --- Core diff calculation: all symbols at once ---
+def calculate_diff_matrix(store, sort_by="price", rows=None):
+    """
+    Calculate price and funding diffs for every symbol quoted by at least two exchanges,
+    or only for the given store rows.
 
-    # Reference values for diff calculation
-    if sort_by == "price":
-        ref_idx = np.argmax(prices)
-    else:
-        ref_idx = np.argmax(fundings)
-    ref_price = prices[ref_idx]
-    ref_funding = fundings[ref_idx]
-
-    price_diff = ref_price - prices
-    price_diff_pct = (price_diff / ref_price * 100) if ref_price else np.zeros_like(prices)
-    funding_diff = ref_funding - fundings
-    funding_diff_pct = abs(funding_diff) * 100  # actual % charged from position
-
-    detailed = []
-    for i, feed_name in enumerate(feed_names):
-        detailed.append({
-            "feed": feed_name,
-            "price": round(prices[i], 8),
-            "priceDiff": round(price_diff[i], 8),
-            "priceDiffPct": round(price_diff_pct[i], 2),
-            "funding24hRate": round(fundings[i], 8),
-            "funding24RateDiff": round(funding_diff[i], 8),
-            "funding24RateDiffPct": round(funding_diff_pct[i], 2),
-        })
+    Missing or incomplete entries are NaN, so every reduction below runs over the whole
+    (symbols x exchanges) matrix in one call instead of once per token.
+
+    Returns a dict of arrays, one row per candidate symbol:
+        rows, prices, fundings, ref_idx, price_diff, price_diff_pct,
+        funding_diff, funding_diff_pct, price_spread_pct, funding_spread_pct
+    """
+    symbols, exchanges, rows, prices, funding24h, valid = prepare_diff_data(store, rows)
 
-    return {"token": token, "sortBy": sort_by, "feeds": detailed}
+    candidates = valid.sum(axis=1) >= 2
+    rows = rows[candidates]
+    mask = valid[candidates]
+    prices = np.where(mask, prices[candidates], np.nan)
+    fundings = np.where(mask, funding24h[candidates], np.nan)
+
+    # Reference exchange for diff calculation
+    ref_idx = np.nanargmax(prices if sort_by == "price" else fundings, axis=1)
+    ref_price = np.take_along_axis(prices, ref_idx[:, None], axis=1)
+    ref_funding = np.take_along_axis(fundings, ref_idx[:, None], axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price_diff = ref_price - prices
+        price_diff_pct = np.where(ref_price != 0, price_diff / ref_price * 100, 0.0)
+        funding_diff = ref_funding - fundings
+        funding_diff_pct = np.abs(funding_diff) * 100  # actual % charged from position
+
+        min_price = np.nanmin(prices, axis=1)
+        max_price = np.nanmax(prices, axis=1)
+        price_spread_pct = np.where(min_price != 0, (max_price - min_price) / min_price * 100, 0.0)
+
+    price_diff_pct = np.where(mask, price_diff_pct, np.nan)
+    funding_spread_pct = np.nanmax(funding_diff_pct, axis=1)
+
+    return {
+        "symbols": symbols,
+        "exchanges": exchanges,
+        "rows": rows,
+        "mask": mask,
+        "prices": prices,
+        "fundings": fundings,
+        "ref_idx": ref_idx,
+        "price_diff": price_diff,
+        "price_diff_pct": price_diff_pct,
+        "funding_diff": funding_diff,
+        "funding_diff_pct": funding_diff_pct,
+        "price_spread_pct": price_spread_pct,
+        "funding_spread_pct": funding_spread_pct,
+    }
+
+def build_diff_table(diffs, flagged, sort_by):
+    """Turn flagged rows of calculate_diff_matrix() output into per-token result dicts."""
+    symbols, exchanges = diffs["symbols"], diffs["exchanges"]
+    sort_values = diffs["prices"] if sort_by == "price" else diffs["fundings"]
 
-# --- Build full tables using NumPy ---
-def find_price_diff_table(raw_data, threshold_percent: float = 0.1):
-    data = prepare_diff_data(raw_data)
     results = []
-    all_tokens = {token for feed in data.values() for token in feed.keys()}
-
-    for token in all_tokens:
-        feeds = []
-        for feed_name, feed_data in data.items():
-            token_data = feed_data.get(token)
-            if token_data and "price" in token_data:
-                feeds.append({
-                    "feed": feed_name,
-                    "price": token_data.get("price", 0),
-                    "funding24hRate": token_data.get("funding24hRate", 0),
-                })
-
-        if len(feeds) < 2:
-            continue
-
-        diffs = calculate_diffs_numpy(token, feeds, sort_by="price")
-        prices = np.array([f["price"] for f in feeds])
-        min_price, max_price = np.min(prices), np.max(prices)
-        price_diff_pct_total = ((max_price - min_price) / min_price * 100) if min_price else 0
-
-        if price_diff_pct_total >= threshold_percent:
-            diffs["feeds"] = sorted(diffs["feeds"], key=lambda f: f["price"], reverse=True)
-            results.append(diffs)
-
-    return sorted(results, key=lambda x: max(f["priceDiffPct"] for f in x["feeds"]), reverse=True)
-
-def find_funding_diff_table(raw_data, threshold_percent: float = 0.1):
-    data = prepare_diff_data(raw_data)
+    for i in flagged:
+        cols = np.flatnonzero(diffs["mask"][i])
+        cols = cols[np.argsort(-sort_values[i, cols], kind="stable")]
+        results.append({
+            "token": symbols[diffs["rows"][i]],
+            "sortBy": sort_by,
+            "feeds": [
+                {
+                    "feed": exchanges[col],
+                    "price": round(float(diffs["prices"][i, col]), 8),
+                    "priceDiff": round(float(diffs["price_diff"][i, col]), 8),
+                    "priceDiffPct": round(float(diffs["price_diff_pct"][i, col]), 2),
+                    "funding24hRate": round(float(diffs["fundings"][i, col]), 8),
+                    "funding24RateDiff": round(float(diffs["funding_diff"][i, col]), 8),
+                    "funding24RateDiffPct": round(float(diffs["funding_diff_pct"][i, col]), 2),
+                }
+                for col in cols
+            ],
+        })
+    return results
+
+# --- Build full tables using NumPy ---
+def find_price_diff_table(store, threshold_percent: float = 0.1, rows=None):
+    diffs = calculate_diff_matrix(store, sort_by="price", rows=rows)
+    flagged = np.flatnonzero(diffs["price_spread_pct"] >= threshold_percent)
+
+    # Order by the largest per-feed ΔPrice%, which is the spread relative to the max price
+    order = np.argsort(-np.round(np.nanmax(diffs["price_diff_pct"][flagged], axis=1), 2), kind="stable")
+    return build_diff_table(diffs, flagged[order], sort_by="price")
+
+def find_funding_diff_table(store, threshold_percent: float = 0.1, rows=None):
+    diffs = calculate_diff_matrix(store, sort_by="funding", rows=rows)
+    spread = np.round(diffs["funding_spread_pct"], 2)
+    flagged = np.flatnonzero(spread >= threshold_percent)
+
+    order = np.argsort(-spread[flagged], kind="stable")
+    return build_diff_table(diffs, flagged[order], sort_by="funding")
+
+# --- Executable spread from order books ---
+def calculate_executable_spread(store, rows=None, now=None):
+    """
+    Best executable cross-exchange spread of every symbol with a fresh book on at least
+    two exchanges, or only for the given store rows.
+
+    bid and ask are the prices each exchange's book fills the feeds' book_notional at,
+    so the spread buying on one exchange and selling on another is what that size
+    actually earns. A side too thin for the notional is NaN and only that side is left
+    out. The best pair is found from the two lowest asks and two highest bids,
+    which covers the case where the cheapest ask and the richest bid are on the same
+    exchange.
+
+    Returns a dict of arrays, one row per candidate symbol:
+        rows, mask, prices, bids, asks, buy_idx, sell_idx, spread_pct
+    """
+    now = time.time() if now is None else now
+    symbols, m = store.view()
+    if rows is None:
+        rows = np.arange(len(symbols))
+    else:
+        m = {name: matrix[rows] for name, matrix in m.items()}
+
+    fresh = m["present"] & (m["booked_at"] >= now - store.quote_ttl)
+    has_bid = fresh & ~np.isnan(m["bid"])
+    has_ask = fresh & ~np.isnan(m["ask"])
+    valid = has_bid | has_ask
+    candidates = has_bid.any(axis=1) & has_ask.any(axis=1) & (valid.sum(axis=1) >= 2)
+    rows = rows[candidates]
+    mask = valid[candidates]
+    bids = np.where(has_bid[candidates], m["bid"][candidates], -np.inf)
+    asks = np.where(has_ask[candidates], m["ask"][candidates], np.inf)
+
+    ask_order = np.argsort(asks, axis=1)[:, :2]
+    bid_order = np.argsort(-bids, axis=1)[:, :2]
+    buy_idx, sell_idx = ask_order[:, 0], bid_order[:, 0]
+
+    same = buy_idx == sell_idx
+    if same.any():
+        at = np.arange(len(rows))
+        # Either sell on the second best bid, or buy on the second best ask
+        with_next_bid = bids[at, bid_order[:, 1]] - asks[at, buy_idx]
+        with_next_ask = bids[at, sell_idx] - asks[at, ask_order[:, 1]]
+        use_next_bid = same & (with_next_bid >= with_next_ask)
+        use_next_ask = same & ~use_next_bid
+        sell_idx = np.where(use_next_bid, bid_order[:, 1], sell_idx)
+        buy_idx = np.where(use_next_ask, ask_order[:, 1], buy_idx)
+
+    at = np.arange(len(rows))
+    buy_ask = asks[at, buy_idx]
+    with np.errstate(invalid="ignore"):
+        spread_pct = (bids[at, sell_idx] - buy_ask) / buy_ask * 100
+
+    return {
+        "symbols": symbols,
+        "exchanges": store.exchanges,
+        "rows": rows,
+        "mask": mask,
+        "prices": np.where(mask, m["price"][candidates], np.nan),
+        "bids": np.where(np.isfinite(bids), bids, np.nan),
+        "asks": np.where(np.isfinite(asks), asks, np.nan),
+        "buy_idx": buy_idx,
+        "sell_idx": sell_idx,
+        "spread_pct": spread_pct,
+    }
+
+def find_executable_spread_table(store, threshold_percent: float = 0.1, rows=None):
+    spreads = calculate_executable_spread(store, rows=rows)
+    spread = np.round(spreads["spread_pct"], 4)
+    flagged = np.flatnonzero(spread >= threshold_percent)
+    flagged = flagged[np.argsort(-spread[flagged], kind="stable")]
+
+    symbols, exchanges = spreads["symbols"], spreads["exchanges"]
     results = []
-    all_tokens = {token for feed in data.values() for token in feed.keys()}
+    for i in flagged:
+        buy, sell = spreads["buy_idx"][i], spreads["sell_idx"][i]
+        buy_ask = spreads["asks"][i, buy]
+        # Sell exchange first, buy exchange last, the others by bid
+        cols = np.flatnonzero(spreads["mask"][i])
+        cols = cols[(cols != buy) & (cols != sell)]
+        cols = [sell] + list(cols[np.argsort(-spreads["bids"][i, cols], kind="stable")]) + [buy]
+        results.append({
+            "token": symbols[spreads["rows"][i]],
+            "sortBy": "executable",
+            "spreadPct": round(float(spread[i]), 4),
+            "buy": exchanges[buy],
+            "sell": exchanges[sell],
+            "feeds": [
+                {
+                    "feed": exchanges[col],
+                    "price": round(float(spreads["prices"][i, col]), 8),
+                    "bid": round(float(spreads["bids"][i, col]), 8),
+                    "ask": round(float(spreads["asks"][i, col]), 8),
+                    "sellDiffPct": round(float((spreads["bids"][i, col] - buy_ask) / buy_ask * 100), 4),
+                }
+                for col in cols
+            ],
+        })
+    return results
 
-    for token in all_tokens:
-        feeds = []
-        for feed_name, feed_data in data.items():
-            token_data = feed_data.get(token)
-            if token_data and "funding24hRate" in token_data:
-                feeds.append({
-                    "feed": feed_name,
-                    "price": token_data.get("price", 0),
-                    "funding24hRate": token_data.get("funding24hRate", 0),
-                })
+# --- Funding carry until the next common settlement ---
+def calculate_carry_matrix(store, tolerance_minutes=0, rows=None, now=None):
+    """
+    Expected funding carry of every symbol quoted by at least two exchanges until their
+    next common settlement, or only for the given store rows.
 
-        if len(feeds) < 2:
-            continue
+    Comparing 24h-normalized rates treats an exchange settling in 5 minutes like one
+    settling in 7 hours. Instead, each symbol's horizon is the latest next settlement
+    among its exchanges, the first time by which all of them have settled; settlements
+    within tolerance_minutes after it belong to the same window. An exchange's carry is
+    its current rate times the number of its settlements up to the horizon, so an hourly
+    exchange is credited every payment it makes while an 8h one settles once.
 
-        diffs = calculate_diffs_numpy(token, feeds, sort_by="funding")
-        fundings = np.array([f["funding24RateDiffPct"] for f in diffs['feeds']])
-        funding_diff_pct_total = max(fundings)
+    Stored next_funding_time values that already passed are rolled forward by whole
+    funding intervals. Entries without a next funding time are left out.
 
-        if funding_diff_pct_total >= threshold_percent:
-            diffs["feeds"] = sorted(diffs["feeds"], key=lambda f: f["funding24hRate"], reverse=True)
-            results.append(diffs)
+    Returns a dict of arrays, one row per candidate symbol:
+        rows, mask, prices, funding_rates, next_funding_times, settlements, horizon,
+        carry_pct, ref_idx, carry_diff_pct, carry_spread_pct
+    """
+    now = time.time() if now is None else now
+    symbols, rows, m, valid = read_store_rows(store, rows, now)
+    valid &= ~np.isnan(m["next_funding_time"])
+
+    candidates = valid.sum(axis=1) >= 2
+    rows = rows[candidates]
+    mask = valid[candidates]
+    period = np.where(mask, m["funding_interval_hours"][candidates] * 3600000, np.nan)
+    next_times = np.where(mask, m["next_funding_time"][candidates], np.nan)
+    tolerance = tolerance_minutes * 60000
+
+    with np.errstate(invalid="ignore"):
+        behind = np.maximum(np.ceil((now * 1000 - next_times) / period), 0)
+        next_times = next_times + behind * period
+
+        horizon = np.nanmax(next_times, axis=1)
+        settlements = np.floor((horizon[:, None] + tolerance - next_times) / period) + 1
+        carry_pct = m["funding_rate"][candidates] * settlements * 100
+
+    # Short the highest carry, long the others
+    ref_idx = np.nanargmax(carry_pct, axis=1)
+    ref_carry = np.take_along_axis(carry_pct, ref_idx[:, None], axis=1)
+    carry_diff_pct = ref_carry - carry_pct
+    carry_spread_pct = np.nanmax(carry_diff_pct, axis=1)
+
+    return {
+        "symbols": symbols,
+        "exchanges": store.exchanges,
+        "rows": rows,
+        "mask": mask,
+        "prices": np.where(mask, m["price"][candidates], np.nan),
+        "funding_rates": m["funding_rate"][candidates],
+        "next_funding_times": next_times,
+        "settlements": settlements,
+        "horizon": horizon,
+        "carry_pct": carry_pct,
+        "ref_idx": ref_idx,
+        "carry_diff_pct": carry_diff_pct,
+        "carry_spread_pct": carry_spread_pct,
+    }
 
-    return sorted(results, key=lambda x: max(f["funding24RateDiffPct"] for f in x["feeds"]), reverse=True)
+def find_funding_carry_table(store, threshold_percent: float = 0.1, tolerance_minutes: float = 0, rows=None):
+    carry = calculate_carry_matrix(store, tolerance_minutes, rows=rows)
+    spread = np.round(carry["carry_spread_pct"], 4)
+    flagged = np.flatnonzero(spread >= threshold_percent)
+    flagged = flagged[np.argsort(-spread[flagged], kind="stable")]
+
+    symbols, exchanges = carry["symbols"], carry["exchanges"]
+    results = []
+    for i in flagged:
+        cols = np.flatnonzero(carry["mask"][i])
+        cols = cols[np.argsort(-carry["carry_pct"][i, cols], kind="stable")]
+        results.append({
+            "token": symbols[carry["rows"][i]],
+            "sortBy": "carry",
+            "settlesAt": int(carry["horizon"][i]),
+            "feeds": [
+                {
+                    "feed": exchanges[col],
+                    "price": round(float(carry["prices"][i, col]), 8),
+                    "fundingRate": round(float(carry["funding_rates"][i, col]), 8),
+                    "nextFundingTime": int(carry["next_funding_times"][i, col]),
+                    "settlements": int(carry["settlements"][i, col]),
+                    "carryPct": round(float(carry["carry_pct"][i, col]), 4),
+                    "carryDiffPct": round(float(carry["carry_diff_pct"][i, col]), 4),
+                }
+                for col in cols
+            ],
+        })
+    return results
 
 # --- Pretty-print helper ---
-def print_diff_table(diff_table):
+def format_diff_number(x, precision=4):
+    if isinstance(x, (int, float)):
+        return f"{x: .{precision}f}"  # space for positive numbers
+    return str(x)
+
+def format_diff_table(diff_table):
+    """Render diff tables as text; only called by human-readable log sinks."""
+    blocks = []
     for token_data in diff_table:
         token = token_data["token"]
         sort_by = token_data["sortBy"]
         feeds = token_data["feeds"]
 
-        print(f"\n{token} (sorted by {sort_by.upper()})")
-        headers = ["Feed", "Price", "ΔPrice%", "Funding24h", "ΔFunding%"]
-
-        def format_number(x, precision=4):
-            if isinstance(x, (int, float)):
-                return f"{x: .{precision}f}"  # space for positive numbers
-            return str(x)
-
-        table = [
-            [
-                f["feed"],
-                format_number(f['price']),
-                format_number(f['priceDiffPct']),
-                format_number(f['funding24hRate']),
-                format_number(f['funding24RateDiffPct']),
+        if sort_by == "executable":
+            title = f"{token} (sorted by EXECUTABLE spread {token_data['spreadPct']:.4f}%, buy {token_data['buy']}, sell {token_data['sell']})"
+            headers = ["Feed", "Price", "Bid", "Ask", "ΔSell%"]
+            table = [
+                [
+                    f["feed"],
+                    format_diff_number(f['price']),
+                    format_diff_number(f['bid']),
+                    format_diff_number(f['ask']),
+                    format_diff_number(f['sellDiffPct']),
+                ]
+                for f in feeds
+            ]
+        elif sort_by == "carry":
+            settles_at = time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(token_data["settlesAt"] / 1000))
+            title = f"{token} (sorted by CARRY until {settles_at})"
+            headers = ["Feed", "Price", "Funding", "Settlements", "Carry%", "ΔCarry%"]
+            table = [
+                [
+                    f["feed"],
+                    format_diff_number(f['price']),
+                    format_diff_number(f['fundingRate'], precision=6),
+                    f['settlements'],
+                    format_diff_number(f['carryPct']),
+                    format_diff_number(f['carryDiffPct']),
+                ]
+                for f in feeds
+            ]
+        else:
+            title = f"{token} (sorted by {sort_by.upper()})"
+            headers = ["Feed", "Price", "ΔPrice%", "Funding24h", "ΔFunding%"]
+            table = [
+                [
+                    f["feed"],
+                    format_diff_number(f['price']),
+                    format_diff_number(f['priceDiffPct']),
+                    format_diff_number(f['funding24hRate']),
+                    format_diff_number(f['funding24RateDiffPct']),
+                ]
+                for f in feeds
             ]
-            for f in feeds
-        ]
 
-        print(tabulate(table, headers=headers, tablefmt="pretty", colalign=["left", "right", "right", "right", "right"]))
+        colalign = ["left"] + ["right"] * (len(headers) - 1)
+        blocks.append(f"\n{title}\n" + tabulate(table, headers=headers, tablefmt="pretty", colalign=colalign))
+    return "\n".join(blocks)
@@ -1,8 +1,8 @@
-import asyncio
-import aiohttp
-import websockets
 import json
 import time
+from typing import TypedDict, Union
+
+from exchange_feed import ExchangeFeed
 
 API_URL = "https://pro.edgex.exchange"
 INFO_URL = f"{API_URL}/api/v1/public/meta/getServerTime"
@@ -13,107 +13,116 @@ WS_POST_MSG = json.dumps({
   "type": "subscribe",
   "channel": "ticker.all"
 })
+DEPTH_LEVELS = 15                          # depth channel size, 15 or 200
+
+class EdgexLevel(TypedDict, total=False):
+    price: str
+    size: str                              # 0 removes the level in "Changed" pushes
+
+class EdgexTicker(TypedDict, total=False):
+    contractId: str
+    contractName: str                      # e.g. "BTCUSD"
+    lastPrice: Union[str, float]
+    fundingRate: Union[str, float]
+    fundingTime: Union[str, int]           # ms since epoch
+    nextFundingTime: Union[str, int]       # ms since epoch
+    bids: list[EdgexLevel]                 # depth channels
+    asks: list[EdgexLevel]
+
+class EdgexContent(TypedDict, total=False):
+    dataType: str                          # "Snapshot" or "Changed"
+    data: list[EdgexTicker]
+
+class EdgexMessage(TypedDict, total=False):
+    type: str
+    channel: str
+    time: Union[str, int]
+    content: EdgexContent
+
+class EdgexFeed(ExchangeFeed):
+    name = "edgex"
+    ws_url = WS_URL
+    health_url = INFO_URL
+    ws_ping_interval = None
+    heartbeat_marker = '"ping"'
+    book_marker = '"depth.'
+    message_schema = EdgexMessage
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.contract_names = {}           # contractId -> contractName of tradable contracts, for depth channels
+
+    def is_healthy(self, data):
+        return "code" in data and data["code"] == "SUCCESS"
+
+    def normalize_symbol(self, raw):
+        return raw[:-3] if raw.endswith("USD") else None  # remove "USD" suffix
+
+    async def refresh_data(self):
+        return await self.refresh_symbols()
+
+    async def refresh_symbols(self):
+        data = await self.fetch_json(META_URL, "meta data")
+        if data is None:
+            return False
+        allowed, denied, contract_names = [], [], {}
+        for item in data["data"]["contractList"]:
+            if item["enableTrade"] is False or item["enableDisplay"] is False or item["enableOpenPosition"] is False:
+                denied.append(item["contractName"])
+            else:
+                allowed.append(item["contractName"])
+                contract_names[item["contractId"]] = item["contractName"]
+        self.registry.replace(allowed, denied)
+        self.contract_names = contract_names
+        return True
+
+    def subscribe_messages(self):
+        return [WS_POST_MSG]
+
+    def book_keys(self):
+        return self.contract_names.keys()
+
+    def book_subscribe_messages(self, contract_ids):
+        return [
+            json.dumps({"type": "subscribe", "channel": f"depth.{contract_id}.{DEPTH_LEVELS}"})
+            for contract_id in contract_ids
+        ]
+
+    def process_depth(self, content):
+        snapshot = content.get("dataType") == "Snapshot"
+        for item in content["data"]:
+            contract_name = self.contract_names.get(item["contractId"])
+            symbol = None if contract_name is None else self.registry.lookup(contract_name)
+            if symbol is None:
+                continue
+            bids = [(float(level["price"]), float(level["size"])) for level in item.get("bids", ())]
+            asks = [(float(level["price"]), float(level["size"])) for level in item.get("asks", ())]
+            book = self.book(symbol)
+            if snapshot:
+                book.snapshot(bids, asks)
+            else:
+                book.apply(bids, asks)
+            self.write_book(symbol, book)
+
+    def ping_reply(self, data):
+        if data.get("type") == "ping":
+            return json.dumps({"type": "pong", "time": data.get("time", time.time())})
+        return None
 
-INITIAL_STREAM_START_DELAY = 30            # seconds before starting main loop
-UPDATE_DATA_INTERVAL = 60                  # seconds between data updates
-PONG_INTERVAL = 30                         # seconds between pongs
-RECONNECT_DELAY = 5                        # seconds before reconnect
-
-PRINT_PREFIX = "[edgex]: "
-
-is_feed_available = False
-ignore_tokens = []
-
-async def check_exchange_health(state):
-    global is_feed_available
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url=INFO_URL) as resp:
-                if resp.status != 200:
-                    print(f"{PRINT_PREFIX}⚠️ Health check failed, status: {resp.status}")
-                    is_feed_available = False
-                    state.clear()
-                    return
-
-                data = await resp.json()
-                
-                if "code" in data and data["code"] == "SUCCESS":
-                    if not is_feed_available:
-                        print(f"{PRINT_PREFIX}✅ Exchange feed is alive.")
-                    is_feed_available = True
-                else:
-                    print(f"{PRINT_PREFIX}❌ Health check returned unexpected format.")
-                    is_feed_available = False
-                    state.clear()
-    except Exception as e:
-        if is_feed_available:
-            print(f"{PRINT_PREFIX}❌ Exchange health check failed:", e)
-        is_feed_available = False
-        state.clear()
-
-async def fill_ignore_tokens_list():
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(url=META_URL) as resp:
-                if resp.status != 200:
-                    print(f"{PRINT_PREFIX}❌ Failed to fetch meta data:", await resp.text())
-                    return
-                data = (await resp.json())["data"]["contractList"]
-                for item in data:
-                    if item["enableTrade"] is False or item["enableDisplay"] is False or item["enableOpenPosition"] is False:
-                        ignore_tokens.append(item["contractName"][:-3])  # remove "USD" suffix
-        except Exception as e:
-            print(f"{PRINT_PREFIX}❌ Error fetching exchange info:", e)
-
-async def periodic_data_refresh(state):
-    while True:
-        await check_exchange_health(state)
-        if is_feed_available:
-            await fill_ignore_tokens_list()
-        await asyncio.sleep(UPDATE_DATA_INTERVAL)
-
-async def process_message(ws, message, state):
-    try:
-        data = json.loads(message)
-        if "type" in message and data["type"] == "ping":
-            await ws.send(json.dumps({"type": "pong", "time": data.get("time", time.time())}))
-        elif "channel" in data and data["channel"] == "ticker.all" and "content" in data:
+    async def process_message(self, ws, message):
+        data = self.decode(message)
+        if "channel" in data and data["channel"] == "ticker.all" and "content" in data:
+            lookup = self.registry.lookup
             for item in data["content"]["data"]:
-                symbol = item["contractName"][:-3]  # remove "USD" suffix
-                if symbol in ignore_tokens:
+                symbol = lookup(item["contractName"])
+                if symbol is None:
                     continue
-                state.setdefault(symbol, {}).update({
-                    "price": float(item["lastPrice"]),
-                    "funding_rate": float(item["fundingRate"]),
-                    "next_funding_time": item["nextFundingTime"],  # ms since epoch
-                    "funding_interval_hours": (float(item["nextFundingTime"]) - float(item["fundingTime"])) / 3600000,
-                })
-    except Exception as e:
-        print(f"{PRINT_PREFIX}❌ Failed to parse message: {e}")
-
-async def handle_stream(state):
-    await asyncio.sleep(INITIAL_STREAM_START_DELAY)
-    while True:
-        try:
-            async with websockets.connect(
-                WS_URL,
-                ping_interval=None,
-            ) as ws:
-                await ws.send(WS_POST_MSG)
-                async for message in ws:
-                    # Skip processing if feed marked unavailable
-                    if not is_feed_available:
-                        await asyncio.sleep(RECONNECT_DELAY)
-                        continue
-                    await process_message(ws, message, state)
-        except Exception as e:
-            print(f"{PRINT_PREFIX}❌ Connection error: {e}")
-            print(f"{PRINT_PREFIX}Reconnecting in {RECONNECT_DELAY}s...")
-            await asyncio.sleep(RECONNECT_DELAY)
-
-
-async def edgex_feed(state):
-    await asyncio.gather(
-        periodic_data_refresh(state),
-        handle_stream(state),
-    )
+                self.update(
+                    symbol,
+                    price=float(item["lastPrice"]),
+                    funding_rate=float(item["fundingRate"]),
+                    next_funding_time=float(item["nextFundingTime"]),  # ms since epoch
+                    funding_interval_hours=(float(item["nextFundingTime"]) - float(item["fundingTime"])) / 3600000,
+                )
+        elif "channel" in data and data["channel"].startswith("depth.") and "content" in data:
+            self.process_depth(data["content"])
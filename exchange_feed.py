@@ -0,0 +1,468 @@
+import logging
+import time
+import weakref
+from operator import attrgetter
+
+import asyncio
+import websockets
+
+from frame_queue import FrameQueue
+from funding_schedule import funding_schedule
+from heartbeat import MESSAGE_DEADLINE, Heartbeat
+from json_decoder import make_decoder
+from metrics import metrics
+from order_book import BOOK_DEPTH, BOOK_NOTIONAL, OrderBook
+from resilience import Backoff, CircuitBreaker
+from symbol_registry import SymbolRegistry
+
+UPDATE_DATA_INTERVAL = 60                  # seconds between data updates
+RECONNECT_DELAY = 5                        # seconds before the first reconnect, doubled per failed attempt
+MAX_RECONNECT_DELAY = 120                  # cap of the reconnect and health-retry backoff, seconds
+STABLE_CONNECTION = 60                     # seconds a connection must last before the reconnect backoff starts over
+HEALTH_FAILURE_THRESHOLD = 3               # failed health checks in a row that open the circuit
+HEALTH_WINDOW = 10                         # health checks the health score is computed over
+HEALTH_MIN_SCORE = 0.5                     # share of successful checks in a full window below which the circuit opens
+WS_PING_INTERVAL = 20                      # websockets' protocol-level ping, None disables it
+FRAME_QUEUE_SIZE = 256                     # frames buffered between reader and parser, oldest dropped first
+BOOK_QUEUE_SIZE = 1024                     # order book frames buffered apart from the ticker frames, oldest dropped first
+BOOK_FRAME_MAX = 16384                     # longest frame checked for the book marker, longer ones are queued as tickers
+MAX_FRAME_AGE = 5                          # seconds a buffered frame may wait before it is discarded as stale
+QUOTE_TTL = 90                             # seconds a price stays usable without a new write, longer than one REST refresh
+ENTRY_TTL = 300                            # seconds without any write before an entry is evicted, a few REST refreshes
+
+PRICE_FIELDS = ("price", "bid", "ask")     # fields scaled by an instrument's price multiplier
+
+PARSE_SECONDS = metrics.histogram("feed_parse_seconds", "Time to parse one frame and write its values", ("exchange",))
+_feeds = weakref.WeakSet()                 # live feeds, read when metrics are scraped
+
+def _collect_feeds(attribute):
+    read = attrgetter(attribute)
+    return lambda: [({"exchange": feed.exchange}, read(feed)) for feed in _feeds]
+
+for _name, _kind, _help, _attribute in (
+    ("feed_messages_received_total", "counter", "Frames read from the socket", "messages_received"),
+    ("feed_messages_parsed_total", "counter", "Frames parsed without error", "messages_parsed"),
+    ("feed_messages_dropped_total", "counter", "Frames dropped from a full queue or as stale", "frames_dropped"),
+    ("feed_book_frames_dropped_total", "counter", "Order book frames dropped from a full book queue", "book_frames.dropped"),
+    ("feed_parse_errors_total", "counter", "Frames that failed to parse", "parse_errors"),
+    ("feed_reconnects_total", "counter", "WebSocket reconnects after an error or a close by the exchange", "reconnects"),
+    ("feed_health_check_failures_total", "counter", "Failed health checks", "health_check_failures"),
+    ("feed_available", "gauge", "1 while the health circuit is closed", "is_feed_available"),
+    ("feed_health_score", "gauge", "Share of successful health checks in the sliding window", "health_score"),
+    ("feed_seconds_since_last_message", "gauge", "Seconds since the last frame, NaN before the first", "seconds_since_last_message"),
+    ("feed_rtt_seconds", "gauge", "Last heartbeat round trip, NaN before the first", "heartbeat.rtt"),
+    ("feed_silent_disconnects_total", "counter", "Connections dropped by the last-message watchdog", "heartbeat.silent_disconnects"),
+):
+    metrics.collect(_name, _kind, _help, _collect_feeds(_attribute))
+
+class ExchangeFeed:
+    """
+    Connection lifecycle shared by every exchange feed; an adapter subclasses it and defines:
+
+        name, ws_url, health_url      store column / exchange key and endpoints
+        is_healthy(data)              whether the health endpoint response means "up"
+        subscribe_messages()          frames sent right after connecting
+        process_message(ws, message)  parse a frame with self.decode(), write it with self.update()
+
+    and optionally message_schema, normalize_symbol(raw), refresh_data(),
+    on_health_data(data), book_marker with book_keys() and book_subscribe_messages(keys),
+    send_heartbeat(ws), is_pong(data), ping_reply(data) and the class settings below.
+    """
+
+    name = None
+    ws_url = None
+    health_url = None
+    message_schema = None
+    ws_ping_interval = WS_PING_INTERVAL
+    heartbeat_interval = None
+    heartbeat_marker = None
+    book_marker = None
+    message_deadline = MESSAGE_DEADLINE
+    update_data_interval = UPDATE_DATA_INTERVAL
+    reconnect_delay = RECONNECT_DELAY
+    max_reconnect_delay = MAX_RECONNECT_DELAY
+    stable_connection = STABLE_CONNECTION
+    health_failure_threshold = HEALTH_FAILURE_THRESHOLD
+    health_window = HEALTH_WINDOW
+    health_min_score = HEALTH_MIN_SCORE
+    frame_queue_size = FRAME_QUEUE_SIZE
+    book_queue_size = BOOK_QUEUE_SIZE
+    max_frame_age = MAX_FRAME_AGE
+    quote_ttl = QUOTE_TTL
+    entry_ttl = ENTRY_TTL
+    funding_interval_hours = None
+    book_depth = BOOK_DEPTH
+    book_notional = BOOK_NOTIONAL
+
+    def __init__(self, store, http, exchange=None, updates=None, recorder=None, ticks=None, books=False):
+        self.store = store
+        self.http = http
+        self.updates = updates
+        self.recorder = recorder
+        self.ticks = ticks
+        self.books_enabled = books         # subscribe to and parse order books, off unless executable spreads are detected
+        if not books:
+            self.book_marker = None
+        self.exchange = exchange or self.name
+        self.log = logging.LoggerAdapter(logging.getLogger(type(self).__module__), {"exchange": self.exchange})
+        self.is_feed_available = False
+        self.available = asyncio.Event()
+        self.ready = asyncio.Event()
+        self.frames = FrameQueue(self.frame_queue_size)
+        self.book_frames = FrameQueue(self.book_queue_size)
+        self.decode = make_decoder(self.message_schema)
+        self.registry = SymbolRegistry(self.exchange, self.normalize_symbol, store.instrument)
+        self.funding = funding_schedule
+        self.books = {}                    # instrument id -> OrderBook, for feeds that stream books
+        self.book_subscriptions = set()    # book_keys() subscribed on the current connection
+        self.ws = None                     # current connection, None while disconnected
+        self.heartbeat = Heartbeat(self)
+        self.health = CircuitBreaker(
+            self.health_failure_threshold,
+            self.health_min_score,
+            self.health_window,
+            self.reconnect_delay,
+            self.max_reconnect_delay,
+        )
+        if self.funding_interval_hours:
+            self.funding.set_default_interval(self.exchange, self.funding_interval_hours)
+
+        # Metrics
+        self.messages_received = 0
+        self.messages_parsed = 0
+        self.parse_errors = 0
+        self.stale_frames = 0
+        self.reconnects = 0
+        self.health_check_failures = 0
+        self.last_message_at = None
+        self.parse_seconds = PARSE_SECONDS.labels(exchange=self.exchange)
+        _feeds.add(self)
+
+    @property
+    def frames_dropped(self):
+        return self.frames.dropped + self.book_frames.dropped + self.stale_frames
+
+    @property
+    def health_score(self):
+        return self.health.score
+
+    @property
+    def seconds_since_last_message(self):
+        if self.last_message_at is None:
+            return float("nan")
+        return time.monotonic() - self.last_message_at
+
+    # --- Adapter interface ---
+    def is_healthy(self, data):
+        raise NotImplementedError
+
+    def normalize_symbol(self, raw):
+        """Symbol for a raw market name, or None to skip that market."""
+        return raw
+
+    def on_health_data(self, data):
+        pass
+
+    async def refresh_data(self):
+        """Reload REST metadata; return whether it loaded, the feed is not ready until it has."""
+        return True
+
+    def subscribe_messages(self):
+        return []
+
+    def book_keys(self):
+        """Raw market keys whose order books the feed streams, from the current metadata; only read with books enabled."""
+        return ()
+
+    def book_subscribe_messages(self, keys):
+        """Frames subscribing to the order books of `keys`."""
+        return []
+
+    async def process_message(self, ws, message):
+        raise NotImplementedError
+
+    async def send_heartbeat(self, ws):
+        pass
+
+    def is_pong(self, data):
+        """Whether a decoded heartbeat frame answers our send_heartbeat()."""
+        return False
+
+    def ping_reply(self, data):
+        """Frame answering a server ping, or None if data is not one."""
+        return None
+
+    # --- State writes ---
+    def update(self, instrument, **fields):
+        """Write fields for an instrument id from self.registry, prices in the exchange's contract units."""
+        multiplier = self.registry.multipliers.get(instrument)
+        if multiplier is not None:
+            for field in PRICE_FIELDS:
+                if fields.get(field) is not None:
+                    fields[field] *= multiplier
+        if self.ticks is not None:
+            self.ticks.append(instrument, fields)
+        if self.updates is not None:
+            self.updates.put(self.exchange, instrument, fields)
+        else:
+            self.store.update(self.exchange, instrument, **fields)
+
+    def book(self, instrument):
+        book = self.books.get(instrument)
+        if book is None:
+            book = self.books[instrument] = OrderBook(self.book_depth)
+        return book
+
+    def write_book(self, instrument, book):
+        """Write the prices `book` can execute book_notional at as the instrument's bid and ask."""
+        bid, ask = book.executable(self.book_notional)
+        self.update(instrument, bid=bid, ask=ask)
+
+    def update_top_of_book(self, instrument, bid, bid_size, ask, ask_size):
+        book = self.book(instrument)
+        book.snapshot(((bid, bid_size),), ((ask, ask_size),))
+        self.write_book(instrument, book)
+
+    def contains(self, instrument):
+        if self.updates is not None:
+            return self.updates.contains(self.exchange, instrument)
+        return self.store.contains(self.exchange, instrument)
+
+    # --- REST ---
+    def health_request(self):
+        return self.http.get(self.health_url)
+
+    async def fetch_json(self, url, what, method="GET", **kwargs):
+        """Request url through the shared HTTP client; return the decoded body, or None after logging why."""
+        try:
+            async with self.http.request(method, url, **kwargs) as resp:
+                if resp.status != 200:
+                    self.log.error("❌ Failed to fetch %s: %s", what, await resp.text())
+                    return None
+                data = await resp.json()
+                if self.recorder is not None:
+                    self.recorder.response(what, data)
+                return data
+        except Exception as e:
+            self.log.error("❌ Error fetching %s: %s", what, e)
+            return None
+
+    def set_available(self, is_available):
+        self.is_feed_available = is_available
+        if is_available:
+            self.available.set()
+        else:
+            self.available.clear()
+
+    def mark_unavailable(self):
+        """Pause the stream and age this feed's prices past their TTL; the values stay until they expire."""
+        self.set_available(False)
+        if self.updates is not None:
+            self.updates.discard_exchange(self.exchange)
+        self.books.clear()
+        self.store.mark_stale(self.exchange)
+
+    async def probe_health(self):
+        """Call the health endpoint once; return its response if it means "up", None after logging why not."""
+        try:
+            async with self.health_request() as resp:
+                if resp.status != 200:
+                    self.log.warning("⚠️ Health check failed, status: %s", resp.status)
+                    return None
+
+                data = await resp.json()
+                if self.recorder is not None:
+                    self.recorder.response("health", data)
+
+                if not self.is_healthy(data):
+                    self.log.warning("⚠️ Health check returned unexpected format.")
+                    return None
+                return data
+        except Exception as e:
+            self.log.warning("⚠️ Exchange health check failed: %s", e)
+            return None
+
+    async def check_exchange_health(self):
+        """
+        Probe health through the circuit breaker.
+
+        The feed stays available through isolated failures and is only marked unavailable
+        when the breaker opens. While it is open, no request is sent until its backoff
+        delay has passed.
+        """
+        if not self.health.allow():
+            return
+        data = await self.probe_health()
+        if data is None:
+            self.health_check_failures += 1
+        self.health.record(data is not None)
+        if self.health.is_open:
+            if self.is_feed_available:
+                self.log.error(
+                    "❌ Health circuit open (health score %.2f), data marked stale, next check in %.0fs.",
+                    self.health.score, self.health.retry_in(),
+                )
+                self.mark_unavailable()
+            return
+        if data is None:
+            return
+        if not self.is_feed_available:
+            self.log.info("✅ Exchange feed is alive.")
+        self.set_available(True)
+        self.on_health_data(data)
+
+    def mark_ready(self):
+        """Metadata is loaded: let the stream connect and count this feed towards detection start."""
+        if not self.ready.is_set():
+            self.log.info("✅ Metadata loaded, feed ready.")
+            self.ready.set()
+            self.store.mark_ready(self.exchange)
+
+    async def periodic_data_refresh(self):
+        bootstrap = Backoff(self.reconnect_delay, self.max_reconnect_delay)
+        while True:
+            await self.check_exchange_health()
+            if self.is_feed_available and await self.refresh_data():
+                self.mark_ready()
+                await self.subscribe_new_books()
+
+            if self.health.is_open:
+                delay = self.health.retry_in()
+            elif not self.ready.is_set():
+                # Until the first bootstrap succeeds, retry at the reconnect pace rather than the refresh pace
+                delay = bootstrap.next_delay()
+            elif self.health.failures:
+                # Confirm or clear a failed check soon instead of a full refresh interval later
+                delay = self.reconnect_delay
+            else:
+                delay = self.update_data_interval
+            await asyncio.sleep(delay)
+
+    # --- WebSocket ---
+    async def subscribe_new_books(self):
+        """Subscribe the open connection to books of markets listed since it connected."""
+        ws = self.ws
+        if ws is None or not self.books_enabled:
+            return
+        keys = [key for key in self.book_keys() if key not in self.book_subscriptions]
+        if not keys:
+            return
+        self.book_subscriptions.update(keys)
+        try:
+            for message in self.book_subscribe_messages(keys):
+                await ws.send(message)
+        except Exception as e:
+            # The stream reconnects and subscribes to every book again
+            self.log.warning("⚠️ Failed to subscribe to %s new order books: %s", len(keys), e)
+            return
+        self.log.info("📚 Subscribed to %s new order books.", len(keys))
+
+    async def handle_message(self, ws, message):
+        started = time.perf_counter()
+        try:
+            await self.process_message(ws, message)
+        except Exception as e:
+            self.parse_errors += 1
+            self.log.error("❌ Failed to parse message: %s", e)
+            return
+        self.messages_parsed += 1
+        self.parse_seconds.observe(time.perf_counter() - started)
+
+    async def read_frames(self, ws):
+        """
+        Receive frames into the queues; return when the socket closes or the feed becomes unavailable.
+
+        Parsing runs in other tasks, so a slow parse never stalls reads. Frames containing
+        book_marker get their own queue, so book bursts never evict ticker frames.
+        """
+        heartbeat = self.heartbeat
+        book_marker = self.book_marker
+        async for message in ws:
+            if not self.is_feed_available:
+                return
+            self.messages_received += 1
+            self.last_message_at = time.monotonic()
+            if heartbeat.claims(message) and await heartbeat.handle(ws, message):
+                continue
+            heartbeat.last_data_at = self.last_message_at
+            if self.recorder is not None:
+                self.recorder.frame(message)
+            # Book frames have their own queue, so a burst of them never evicts ticker frames
+            if book_marker is not None and type(message) is str and len(message) <= BOOK_FRAME_MAX and book_marker in message:
+                self.book_frames.put((self.last_message_at, message))
+            else:
+                self.frames.put((self.last_message_at, message))
+
+    async def process_frames(self, ws, frames):
+        while True:
+            received_at, message = await frames.get()
+            if time.monotonic() - received_at > self.max_frame_age:
+                self.stale_frames += 1
+                continue
+            await self.handle_message(ws, message)
+
+    async def handle_stream(self):
+        """
+        Connect once ready and reconnect with backoff while the feed is available.
+
+        A connection the exchange closes, cleanly or not, is a failed attempt; the
+        backoff starts over after one lasted stable_connection seconds.
+        """
+        await self.ready.wait()
+        backoff = Backoff(self.reconnect_delay, self.max_reconnect_delay)
+        while True:
+            if not self.is_feed_available:
+                self.log.warning("⏸️ Feed unavailable, stream paused until it recovers.")
+                await self.available.wait()
+
+            heartbeat_task = None
+            process_tasks = ()
+            connected_at = None
+            error = None
+            try:
+                async with websockets.connect(
+                    self.ws_url,
+                    ping_interval=self.ws_ping_interval,
+                ) as ws:
+                    connected_at = time.monotonic()
+                    keys = list(self.book_keys()) if self.books_enabled else []
+                    self.book_subscriptions = set(keys)
+                    self.ws = ws
+                    for subscribe_message in self.subscribe_messages() + self.book_subscribe_messages(keys):
+                        await ws.send(subscribe_message)
+                    if self.heartbeat_interval or self.message_deadline:
+                        heartbeat_task = asyncio.create_task(self.heartbeat.run(ws))
+                    process_tasks = [asyncio.create_task(self.process_frames(ws, self.frames))]
+                    if self.book_marker is not None:
+                        process_tasks.append(asyncio.create_task(self.process_frames(ws, self.book_frames)))
+
+                    await self.read_frames(ws)
+            except Exception as e:
+                error = e
+            finally:
+                self.ws = None
+                for task in (heartbeat_task, *process_tasks):
+                    if task is not None:
+                        task.cancel()
+                self.frames.clear()
+                self.book_frames.clear()
+
+            if error is None and not self.is_feed_available:
+                continue  # closed on purpose, the loop waits for recovery
+            # A clean close by the server is a failed attempt too, or a server that accepts
+            # and closes at once would be reconnected to in a tight loop
+            self.reconnects += 1
+            if connected_at is not None and time.monotonic() - connected_at >= self.stable_connection:
+                backoff.reset()
+            delay = backoff.next_delay()
+            if error is None:
+                self.log.warning("⚠️ Connection closed by the exchange. Reconnecting in %.1fs...", delay)
+            else:
+                self.log.error("❌ Connection error: %s. Reconnecting in %.1fs...", error, delay)
+            await asyncio.sleep(delay)
+
+    async def run(self):
+        await asyncio.gather(
+            self.periodic_data_refresh(),
+            self.handle_stream(),
+        )
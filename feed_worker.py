@@ -0,0 +1,87 @@
+import logging
+import multiprocessing
+
+import asyncio
+
+from http_client import HttpClient
+from log_config import setup_logging
+from metrics import serve_metrics
+from recorder import FeedRecorder
+from shared_state import SharedMarketStateStore
+from tick_log import TickLog
+from update_buffer import UpdateBuffer
+
+WORKER_CHECK_INTERVAL = 5                  # seconds between liveness checks of feed worker processes
+
+log = logging.getLogger(__name__)
+
+async def _run_feeds(spec, feed_classes, sweep_interval, record_dir, metrics_port, tick_log_dir, books):
+    store = SharedMarketStateStore.attach(spec)
+    exchanges = [feed_class.name for feed_class in feed_classes]
+    store.claim_columns(exchanges)
+    updates = UpdateBuffer(store)
+
+    async with HttpClient() as http:
+        feeds = [
+            feed_class(
+                store,
+                http,
+                updates=updates,
+                recorder=FeedRecorder(record_dir, feed_class.name, feed_class.name) if record_dir else None,
+                ticks=TickLog(tick_log_dir, feed_class.name, store.symbols) if tick_log_dir else None,
+                books=books,
+            )
+            for feed_class in feed_classes
+        ]
+        tasks = [updates.run(), store.run_sweeper(sweep_interval, exchanges)] + [feed.run() for feed in feeds]
+        if metrics_port:
+            tasks.append(serve_metrics(metrics_port))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for feed in feeds:
+                if feed.recorder is not None:
+                    feed.recorder.close()
+                if feed.ticks is not None:
+                    feed.ticks.close()
+
+def run_feed_worker(spec, feed_classes, sweep_interval, record_dir=None, metrics_port=0, tick_log_dir=None, books=False):
+    """Process entry point: run a group of feeds writing into the shared state store, with their own /metrics if metrics_port is set."""
+    setup_logging()
+    try:
+        asyncio.run(_run_feeds(spec, feed_classes, sweep_interval, record_dir, metrics_port, tick_log_dir, books))
+    except KeyboardInterrupt:
+        pass
+
+async def supervise_feed_workers(store, groups, sweep_interval, record_dir=None, metrics_port=0, tick_log_dir=None, books=False):
+    """
+    Start one worker process per group of feed classes and restart any that exit.
+
+    With metrics_port set, worker i serves its feeds' metrics on metrics_port + 1 + i.
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = [None] * len(groups)
+    try:
+        while True:
+            for i, feed_classes in enumerate(groups):
+                process = processes[i]
+                if process is not None and process.is_alive():
+                    continue
+
+                names = ",".join(feed_class.name for feed_class in feed_classes)
+                if process is not None:
+                    log.error("❌ Feed worker [%s] exited with code %s, restarting...", names, process.exitcode)
+                process = context.Process(
+                    target=run_feed_worker,
+                    args=(store.spec(), feed_classes, sweep_interval, record_dir, metrics_port + 1 + i if metrics_port else 0, tick_log_dir, books),
+                    name=f"feeds[{names}]",
+                    daemon=True,
+                )
+                process.start()
+                processes[i] = process
+                log.info("✅ Feed worker [%s] started, pid %s.", names, process.pid)
+            await asyncio.sleep(WORKER_CHECK_INTERVAL)
+    finally:
+        for process in processes:
+            if process is not None and process.is_alive():
+                process.terminate()
@@ -0,0 +1,34 @@
+from collections import deque
+
+import asyncio
+
+class FrameQueue:
+    """
+    Bounded FIFO between a WebSocket reader and its parser.
+
+    When full, put() drops the oldest item so the newest frames always get through.
+    A parser that falls behind skips ahead instead of working through a backlog.
+    """
+
+    def __init__(self, maxsize):
+        self.items = deque(maxlen=maxsize)
+        self.dropped = 0
+        self._ready = asyncio.Event()
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, item):
+        if len(self.items) == self.items.maxlen:
+            self.dropped += 1
+        self.items.append(item)
+        self._ready.set()
+
+    async def get(self):
+        while not self.items:
+            self._ready.clear()
+            await self._ready.wait()
+        return self.items.popleft()
+
+    def clear(self):
+        self.items.clear()
@@ -0,0 +1,51 @@
+import math
+import time
+
+class FundingSchedule:
+    """
+    Next funding settlement times, cached per funding interval.
+
+    Exchanges settle on UTC boundaries of their funding interval (every 1h, 4h, 8h...),
+    which are multiples of the interval since the epoch. The next boundary of each
+    interval is computed once and reused until it passes, so a feed can stamp
+    next_funding_time on every tick for a couple of dict lookups, with no datetime
+    objects on the tick path.
+
+    Each exchange has a default interval; per-symbol intervals (MEXC collectCycle, Aster
+    fundingIntervalHours, Gate funding_interval) override it via set_interval(). Feeds
+    whose exchange reports the next settlement use this schedule only when a message
+    leaves it out.
+    """
+
+    def __init__(self):
+        self.default_intervals = {}        # exchange -> hours
+        self.intervals = {}                # (exchange, symbol) -> hours
+        self._next_boundaries = {}         # hours -> next boundary, ms since epoch
+
+    def set_default_interval(self, exchange, hours):
+        self.default_intervals[exchange] = hours
+
+    def set_interval(self, exchange, symbol, hours):
+        if hours:
+            self.intervals[(exchange, symbol)] = hours
+
+    def interval_hours(self, exchange, symbol):
+        return self.intervals.get((exchange, symbol)) or self.default_intervals.get(exchange)
+
+    def next_boundary(self, hours, now=None):
+        """Next multiple of `hours` since the epoch, in ms since epoch."""
+        now_ms = (time.time() if now is None else now) * 1000
+        period = hours * 3600000
+        boundary = self._next_boundaries.get(hours)
+        if boundary is None or not boundary - period <= now_ms < boundary:
+            boundary = self._next_boundaries[hours] = (math.floor(now_ms / period) + 1) * period
+        return boundary
+
+    def next_funding_time(self, exchange, symbol, now=None):
+        """Next settlement of (exchange, symbol) in ms since epoch, or None if its interval is unknown."""
+        hours = self.interval_hours(exchange, symbol)
+        if hours is None:
+            return None
+        return self.next_boundary(hours, now)
+
+funding_schedule = FundingSchedule()
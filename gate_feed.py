@@ -1,7 +1,8 @@
-import asyncio
-import aiohttp
-import websockets
 import json
+import time
+from typing import TypedDict, Union
+
+from exchange_feed import ExchangeFeed
 
 BASE_URL = "https://api.gateio.ws/api/v4"
 CONTRACTS_URL = f"{BASE_URL}/futures/usdt/contracts"
@@ -9,105 +10,106 @@ CONTRACTS_URL = f"{BASE_URL}/futures/usdt/contracts"
 
 WS_URL = "wss://fx-ws.gateio.ws/v4/ws/usdt"
 DATA_MSG = json.dumps({"channel": "futures.tickers", "event": "subscribe", "payload": ["!all"]})
-
-INITIAL_STREAM_START_DELAY = 30            # seconds before starting main loop
-UPDATE_DATA_INTERVAL = 60                  # seconds between data updates
-RECONNECT_DELAY = 5                        # seconds before reconnect
-
-PRINT_PREFIX = "[gate]: "
-
-is_feed_available = False
-
-async def check_exchange_health_and_fill_tokens_data(state):
-    global is_feed_available
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url=CONTRACTS_URL) as resp:
-                if resp.status != 200:
-                    print(f"{PRINT_PREFIX}❌ Health check failed, status: {resp.status}")
-                    is_feed_available = False
-                    state.clear()
-                    return
-
-                data = await resp.json()
-                
-                if isinstance(data, list) and len(data) > 0:
-                    if not is_feed_available:
-                        print(f"{PRINT_PREFIX}✅ Exchange feed is alive.")
-                    is_feed_available = True
-                    fill_tokens_data(data, state)
-                else:
-                    print(f"{PRINT_PREFIX}❌ Health check returned unexpected format.")
-                    is_feed_available = False
-                    state.clear()
-    except Exception as e:
-        if is_feed_available:
-            print(f"{PRINT_PREFIX}❌ Exchange health check failed:", e)
-        is_feed_available = False
-        state.clear()
-
-def fill_tokens_data(data, state):
-    for item in data:
-        if item["in_delisting"] == True or item["status"] != "trading" or item["is_pre_market"] == True:
-            continue
-        
-        symbol = item["name"][:-5]
-        state.setdefault(symbol, {})
-
-        state[symbol].update({
-            "price": float(item["last_price"]),
-            "funding_rate": float(item["funding_rate"]),
-            "next_funding_time": item["funding_next_apply"] * 1000,
-            "funding_interval_hours": item["funding_interval"] / 3600,
-        })
-
-
-async def periodic_data_refresh(state):
-    while True:
-        await check_exchange_health_and_fill_tokens_data(state)
-        await asyncio.sleep(UPDATE_DATA_INTERVAL)
-
-async def process_message(message, state):
-    try:
-        message = json.loads(message)
-
-        if "channel" in message and message["channel"] == "futures.tickers" and "event" in message and message["event"] == "update":
-          data = message["result"]
-          for item in data:
-              symbol = item["contract"][:-5]
-              if symbol in state:
-                  state[symbol].update({
-                      "price": float(item["last"])
-                  })
+PING_INTERVAL = 20
+
+class GateTicker(TypedDict, total=False):
+    contract: str                          # e.g. "BTC_USDT"
+    last: str
+
+class GateBookTicker(TypedDict, total=False):
+    s: str                                 # contract
+    b: str                                 # best bid price
+    B: int                                 # best bid size, in contracts
+    a: str                                 # best ask price
+    A: int                                 # best ask size, in contracts
+
+class GateMessage(TypedDict, total=False):
+    channel: str
+    event: str
+    result: Union[list[GateTicker], GateBookTicker]
+
+class GateFeed(ExchangeFeed):
+    name = "gate"
+    ws_url = WS_URL
+    health_url = CONTRACTS_URL
+    message_schema = GateMessage
+    heartbeat_interval = PING_INTERVAL
+    heartbeat_marker = "futures.pong"
+    book_marker = "futures.book_ticker"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.contract_sizes = {}           # contract -> base units per contract (quanto_multiplier)
+
+    def is_healthy(self, data):
+        return isinstance(data, list) and len(data) > 0
+
+    def normalize_symbol(self, raw):
+        return raw[:-5] if raw.endswith("_USDT") else None  # remove "_USDT" suffix
+
+    async def send_heartbeat(self, ws):
+        await ws.send(json.dumps({"time": int(time.time()), "channel": "futures.ping"}))
+
+    def is_pong(self, data):
+        return data.get("channel") == "futures.pong"
+
+    def on_health_data(self, data):
+        self.fill_tokens_data(data)
+
+    def fill_tokens_data(self, data):
+        allowed, denied = [], []
+        for item in data:
+            if item["in_delisting"] == True or item["status"] != "trading" or item["is_pre_market"] == True:
+                denied.append(item["name"])
+            else:
+                allowed.append(item["name"])
+        self.registry.replace(allowed, denied)
+        self.contract_sizes = {item["name"]: float(item["quanto_multiplier"]) for item in data if "quanto_multiplier" in item}
+
+        for item in data:
+            symbol = self.registry.lookup(item["name"])
+            if symbol is None:
+                continue
+
+            self.funding.set_interval(self.exchange, symbol, item["funding_interval"] / 3600)
+            next_apply = item.get("funding_next_apply")
+            self.update(
+                symbol,
+                price=float(item["last_price"]),
+                funding_rate=float(item["funding_rate"]),
+                next_funding_time=next_apply * 1000 if next_apply else self.funding.next_funding_time(self.exchange, symbol),
+                funding_interval_hours=item["funding_interval"] / 3600,
+            )
+
+    def subscribe_messages(self):
+        return [DATA_MSG]
+
+    def book_keys(self):
+        return [contract for contract, symbol in self.registry.symbols.items() if symbol is not None]
+
+    def book_subscribe_messages(self, contracts):
+        if not contracts:
+            return []
+        return [json.dumps({"channel": "futures.book_ticker", "event": "subscribe", "payload": list(contracts)})]
+
+    async def process_message(self, ws, message):
+        message = self.decode(message)
+
+        if message.get("channel") == "futures.tickers" and message.get("event") == "update":
+            lookup = self.registry.lookup
+            for item in message["result"]:
+                symbol = lookup(item["contract"])
+                if symbol is not None and self.contains(symbol):
+                    self.update(symbol, price=float(item["last"]))
+        elif message.get("channel") == "futures.book_ticker" and message.get("event") == "update":
+            item = message["result"]
+            symbol = self.registry.lookup(item["s"])
+            contract_size = self.contract_sizes.get(item["s"])
+            if symbol is not None and contract_size is not None:
+                self.update_top_of_book(
+                    symbol,
+                    float(item["b"]), item["B"] * contract_size,
+                    float(item["a"]), item["A"] * contract_size,
+                )
         else:
-            print(f"{PRINT_PREFIX} Not Ticker Message")
-            print(json.dumps(message, indent=4))
-    except Exception as e:
-        print(f"{PRINT_PREFIX}❌ Failed to parse message: {e}")
-
-async def handle_stream(state):
-    await asyncio.sleep(INITIAL_STREAM_START_DELAY)
-    while True:
-        try:
-            async with websockets.connect(
-                WS_URL,
-            ) as ws:
-                await ws.send(DATA_MSG)
-                async for message in ws:
-                    # Skip processing if feed marked unavailable
-                    if not is_feed_available:
-                        await asyncio.sleep(RECONNECT_DELAY)
-                        continue
-                    
-                    await process_message(message, state)
-        except Exception as e:
-            print(f"{PRINT_PREFIX}❌ Connection error: {e}")
-            print(f"{PRINT_PREFIX}Reconnecting in {RECONNECT_DELAY}s...")
-            await asyncio.sleep(RECONNECT_DELAY)
-
-async def gate_feed(state):
-    await asyncio.gather(
-        periodic_data_refresh(state),
-        handle_stream(state),
-    )
-
+            self.log.debug("Not a ticker message: %s", message)
@@ -0,0 +1,107 @@
+import json
+import time
+
+import asyncio
+
+from metrics import metrics
+
+MESSAGE_DEADLINE = 30                      # seconds without a data frame before the socket counts as dead and is dropped
+HEARTBEAT_FRAME_MAX = 256                  # longest frame checked for a heartbeat marker, longer ones are data
+
+RTT_SECONDS = metrics.histogram("feed_heartbeat_rtt_seconds", "Round trip of application-level pings", ("exchange",))
+
+class Heartbeat:
+    """
+    Keep-alive and liveness of one feed's WebSocket, configured by the feed's class attributes.
+
+    run() sends the feed's send_heartbeat() every heartbeat_interval seconds and watches
+    the time since the last data frame: after message_deadline seconds of silence it
+    aborts the socket, so the stream reconnects (with backoff) instead of waiting on a
+    half-open connection for minutes.
+
+    The reader passes frames to claims() before they are queued. Only short frames
+    containing the feed's heartbeat_marker are decoded here; a pong to our ping records
+    the round-trip time and a server ping gets the feed's ping_reply(). Either way the
+    frame never reaches process_message(), so tickers are parsed without heartbeat checks.
+    Feeds without application-level pongs report websockets' protocol ping latency.
+    """
+
+    def __init__(self, feed):
+        self.feed = feed
+        self.interval = feed.heartbeat_interval
+        self.deadline = feed.message_deadline
+        self.marker = feed.heartbeat_marker
+        self.ws = None
+        self.ping_sent_at = None
+        self.last_rtt = None
+        self.last_data_at = None
+        self.rtt_seconds = RTT_SECONDS.labels(exchange=feed.exchange)
+
+        # Metrics
+        self.pings_sent = 0
+        self.pongs_received = 0
+        self.pings_answered = 0
+        self.silent_disconnects = 0
+
+    @property
+    def rtt(self):
+        """Last measured round trip in seconds, NaN before the first."""
+        if self.last_rtt is not None:
+            return self.last_rtt
+        if self.ws is not None and self.ws.latency:
+            return self.ws.latency
+        return float("nan")
+
+    def claims(self, message):
+        return self.marker is not None and type(message) is str and len(message) <= HEARTBEAT_FRAME_MAX and self.marker in message
+
+    async def handle(self, ws, message):
+        """Consume a claimed frame; return False if it turned out to be data after all."""
+        try:
+            data = json.loads(message)
+        except ValueError:
+            return False
+        if not isinstance(data, dict):
+            return False
+        if self.feed.is_pong(data):
+            self.pongs_received += 1
+            if self.ping_sent_at is not None:
+                self.last_rtt = time.monotonic() - self.ping_sent_at
+                self.rtt_seconds.observe(self.last_rtt)
+                self.ping_sent_at = None
+            return True
+        reply = self.feed.ping_reply(data)
+        if reply is not None:
+            await ws.send(reply)
+            self.pings_answered += 1
+            return True
+        return False
+
+    async def run(self, ws):
+        """Ping and watch one connection until it is aborted for silence or the task is cancelled."""
+        self.ws = ws
+        connected_at = time.monotonic()
+        next_ping = connected_at + self.interval if self.interval else None
+        while True:
+            now = time.monotonic()
+            if next_ping is not None and now >= next_ping:
+                try:
+                    await self.feed.send_heartbeat(ws)
+                except Exception as e:
+                    self.feed.log.error("❌ Heartbeat failed: %s", e)
+                    return
+                self.pings_sent += 1
+                self.ping_sent_at = now
+                next_ping = now + self.interval
+
+            silent = now - max(connected_at, self.last_data_at or 0)
+            if self.deadline and silent > self.deadline:
+                self.silent_disconnects += 1
+                self.feed.log.error("❌ No data for %.0fs, dropping the connection.", silent)
+                ws.transport.abort()
+                return
+
+            wake = [self.deadline / 4] if self.deadline else []
+            if next_ping is not None:
+                wake.append(next_ping - now)
+            await asyncio.sleep(max(0.05, min(wake)) if wake else 3600)
@@ -0,0 +1,136 @@
+import os
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", 4))                # pooled connections per host
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 120))       # seconds an idle connection is kept
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", 600))                 # seconds DNS answers are cached
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))                            # seconds per request, total
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))             # seconds to establish a connection
+
+class HostStats:
+    __slots__ = ("requests", "new_connections", "reused_connections", "latency_total", "latency_max")
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    @property
+    def reuse_ratio(self):
+        connections = self.new_connections + self.reused_connections
+        return self.reused_connections / connections if connections else 0.0
+
+    @property
+    def latency_avg(self):
+        return self.latency_total / self.requests if self.requests else 0.0
+
+class HttpClient:
+    """
+    One pooled aiohttp session shared by every feed and the Telegram sender.
+
+    Connections are kept alive per host and DNS answers are cached, so periodic REST
+    calls reuse an open TLS connection instead of handshaking each time.
+    Per-host request latency and connection reuse are recorded in `stats`.
+
+    Usage:
+        async with HttpClient() as http:
+            async with http.get(url) as resp:
+                ...
+    """
+
+    def __init__(
+        self,
+        limit_per_host=HTTP_LIMIT_PER_HOST,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl=HTTP_DNS_CACHE_TTL,
+        timeout=HTTP_TIMEOUT,
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+    ):
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.stats = defaultdict(HostStats)
+        self.session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            trace_configs=[self._trace_config()],
+        )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, trace_request_ctx=SimpleNamespace(), **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def _trace_config(self):
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_request_end.append(self._on_request_end)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        return trace_config
+
+    async def _on_request_start(self, session, ctx, params):
+        ctx.trace_request_ctx.host = params.url.host
+        ctx.trace_request_ctx.start = time.perf_counter()
+
+    async def _on_request_end(self, session, ctx, params):
+        latency = time.perf_counter() - ctx.trace_request_ctx.start
+        stats = self.stats[params.url.host]
+        stats.requests += 1
+        stats.latency_total += latency
+        stats.latency_max = max(stats.latency_max, latency)
+
+    async def _on_connection_create_end(self, session, ctx, params):
+        self.stats[ctx.trace_request_ctx.host].new_connections += 1
+
+    async def _on_connection_reuseconn(self, session, ctx, params):
+        self.stats[ctx.trace_request_ctx.host].reused_connections += 1
+
+    def stats_table(self):
+        """Rows of [host, requests, new conns, reused conns, reuse %, avg ms, max ms]."""
+        return [
+            [
+                host,
+                stats.requests,
+                stats.new_connections,
+                stats.reused_connections,
+                f"{stats.reuse_ratio * 100:.1f}",
+                f"{stats.latency_avg * 1000:.1f}",
+                f"{stats.latency_max * 1000:.1f}",
+            ]
+            for host, stats in sorted(self.stats.items())
+        ]
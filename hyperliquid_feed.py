@@ -1,12 +1,12 @@
-import asyncio
-import aiohttp
-import websockets
 import json
-from datetime import datetime, timedelta, timezone
+from typing import TypedDict
+
+from exchange_feed import ExchangeFeed
 
 INFO_URL = "https://api.hyperliquid.xyz/info"
-HEALTH_API_POST_MSG = json.dumps({ 
-  "type": "exchangeStatus" 
+JSON_HEADERS = {'Content-Type': 'application/json'}
+HEALTH_API_POST_MSG = json.dumps({
+  "type": "exchangeStatus"
 })
 META_API_POST_MSG = json.dumps({
 	"type": "metaAndAssetCtxs"
@@ -19,135 +19,116 @@ WS_POST_MSG = json.dumps({
     "type": "allMids"
   }
 })
-
-INITIAL_STREAM_START_DELAY = 30            # seconds before starting main loop
-UPDATE_DATA_INTERVAL = 60                  # seconds between data updates
-RECONNECT_DELAY = 5                        # seconds before reconnect
-
-PRINT_PREFIX = "[hyperliquid]: "
-
-is_feed_available = False
-ignore_tokens = []
-
-async def check_exchange_health(state):
-    global is_feed_available
-    try:
-        async with aiohttp.ClientSession() as session:
-            session.headers.update({'Content-Type': 'application/json'})
-            async with session.post(url=INFO_URL, data=HEALTH_API_POST_MSG) as resp:
-                if resp.status != 200:
-                    print(f"{PRINT_PREFIX}❌ Health check failed, status: {resp.status}")
-                    is_feed_available = False
-                    state.clear()
-                    return
-
-                data = await resp.json()
-                
-                if "time" in data and data["time"] > 0:
-                    if not is_feed_available:
-                        print(f"{PRINT_PREFIX}✅ Exchange feed is alive.")
-                    is_feed_available = True
-                else:
-                    print(f"{PRINT_PREFIX}❌ Health check returned unexpected format.")
-                    is_feed_available = False
-                    state.clear()
-    except Exception as e:
-        if is_feed_available:
-            print(f"{PRINT_PREFIX}❌ Exchange health check failed:", e)
-        is_feed_available = False
-        state.clear()
-
-async def fill_ignore_tokens_list():
-    async with aiohttp.ClientSession() as session:
-        try:
-            session.headers.update({'Content-Type': 'application/json'})
-            async with session.post(url=INFO_URL, data=META_API_POST_MSG) as resp:
-                if resp.status != 200:
-                    print(f"{PRINT_PREFIX}❌ Failed to fetch meta data:", await resp.text())
-                    return
-                data = (await resp.json())[0]
-                for item in data["universe"]:
-                    if "isDelisted" in item or "onlyIsolated" in item:
-                        ignore_tokens.append(item["name"])
-        except Exception as e:
-            print(f"{PRINT_PREFIX}❌ Error fetching exchange info:", e)
-
-async def fetch_funding_info(state):
-    async with aiohttp.ClientSession() as session:
-        try:
-            session.headers.update({'Content-Type': 'application/json'})
-            async with session.post(url=INFO_URL, data=META_API_POST_MSG) as resp:
-                if resp.status != 200:
-                    print(f"{PRINT_PREFIX}❌ Failed to fetch meta data:", await resp.text())
-                    return
-            
-                data = await resp.json()
-
-                funding_interval_hours = 1
-                next_funding_time = int((datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)).timestamp()*1000)
-
-                for i in range(len(data[1])):
-                    symbol = data[0]["universe"][i]["name"]
-
-                    if symbol in ignore_tokens:
-                        continue
-
-                    funding_rate = float(data[1][i]["funding"])
-
-                    state.setdefault(symbol, {})
-                    state[symbol].update({
-                        "funding_rate": funding_rate,
-                        "next_funding_time": next_funding_time,
-                        "funding_interval_hours": funding_interval_hours,
-                    })
-        except Exception as e:
-            print(f"{PRINT_PREFIX}❌ Error fetching funding info:", e)
-
-async def periodic_data_refresh(state):
-    while True:
-        await check_exchange_health(state)
-        if is_feed_available:
-          await fill_ignore_tokens_list()
-          await fetch_funding_info(state)
-        await asyncio.sleep(UPDATE_DATA_INTERVAL)
-
-async def process_message(message: str, state):
-    try:
-        message = json.loads(message)
+PING_MSG = json.dumps({"method": "ping"})
+PING_INTERVAL = 30                         # the server drops connections it has not heard from in 60s
+
+class HyperliquidLevel(TypedDict, total=False):
+    px: str
+    sz: str
+
+class HyperliquidData(TypedDict, total=False):
+    mids: dict[str, str]                   # allMids: coin -> mid price
+    coin: str                              # l2Book
+    levels: list[list[HyperliquidLevel]]   # l2Book: [bids, asks], best first
+
+class HyperliquidMessage(TypedDict, total=False):
+    channel: str
+    data: HyperliquidData
+
+class HyperliquidFeed(ExchangeFeed):
+    name = "hl"
+    ws_url = WS_URL
+    message_schema = HyperliquidMessage
+    heartbeat_interval = PING_INTERVAL
+    heartbeat_marker = '"pong"'
+    book_marker = '"l2Book"'
+    funding_interval_hours = 1
+
+    def health_request(self):
+        return self.http.post(INFO_URL, headers=JSON_HEADERS, data=HEALTH_API_POST_MSG)
+
+    def is_healthy(self, data):
+        return "time" in data and data["time"] > 0
+
+    def normalize_symbol(self, raw):
+        return None if "@" in raw or "/" in raw else raw  # skip spot pairs
+
+    async def send_heartbeat(self, ws):
+        await ws.send(PING_MSG)
+
+    def is_pong(self, data):
+        return data.get("channel") == "pong"
+
+    async def refresh_data(self):
+        loaded = await self.refresh_symbols()
+        await self.fetch_funding_info()
+        return loaded
+
+    async def fetch_meta(self):
+        return await self.fetch_json(INFO_URL, "meta data", method="POST", headers=JSON_HEADERS, data=META_API_POST_MSG)
+
+    async def refresh_symbols(self):
+        data = await self.fetch_meta()
+        if data is None:
+            return False
+        universe = data[0]["universe"]
+        self.registry.replace(
+            allowed=[item["name"] for item in universe if "isDelisted" not in item and "onlyIsolated" not in item],
+            denied=[item["name"] for item in universe if "isDelisted" in item or "onlyIsolated" in item],
+        )
+        return True
+
+    async def fetch_funding_info(self):
+        data = await self.fetch_meta()
+        if data is None:
+            return
+
+        for i in range(len(data[1])):
+            symbol = self.registry.lookup(data[0]["universe"][i]["name"])
+            if symbol is None:
+                continue
+
+            funding_rate = float(data[1][i]["funding"])
+
+            self.update(
+                symbol,
+                funding_rate=funding_rate,
+                next_funding_time=self.funding.next_funding_time(self.exchange, symbol),
+                funding_interval_hours=self.funding_interval_hours,
+            )
+
+    def subscribe_messages(self):
+        return [WS_POST_MSG]
+
+    def book_keys(self):
+        return [coin for coin, symbol in self.registry.symbols.items() if symbol is not None]
+
+    def book_subscribe_messages(self, coins):
+        # l2Book pushes full snapshots of the top 20 levels per coin
+        return [
+            json.dumps({"method": "subscribe", "subscription": {"type": "l2Book", "coin": coin}})
+            for coin in coins
+        ]
+
+    async def process_message(self, ws, message):
+        message = self.decode(message)
         if message["channel"] == "allMids":
-          data = message["data"]["mids"]
-          for symbol, price in data.items():
-              if "@" in symbol or "/" in symbol or symbol in ignore_tokens:
-                  continue
-              state.setdefault(symbol, {}).update({
-                  "price": float(price),
-              })
-    except Exception as e:
-        print(f"{PRINT_PREFIX}❌ Failed to parse message: {e}")
-
-async def handle_stream(state):
-    await asyncio.sleep(INITIAL_STREAM_START_DELAY)
-    while True:
-        try:
-            async with websockets.connect(
-                WS_URL,
-            ) as ws:
-                await ws.send(WS_POST_MSG)
-                async for message in ws:
-                    # Skip processing if feed marked unavailable
-                    if not is_feed_available:
-                        await asyncio.sleep(RECONNECT_DELAY)
-                        continue
-                    
-                    await process_message(message, state)
-        except Exception as e:
-            print(f"{PRINT_PREFIX}❌ Connection error: {e}")
-            print(f"{PRINT_PREFIX}Reconnecting in {RECONNECT_DELAY}s...")
-            await asyncio.sleep(RECONNECT_DELAY)
-
-async def hyperliquid_feed(state):
-    await asyncio.gather(
-        periodic_data_refresh(state),
-        handle_stream(state),
-    )
-
+            data = message["data"]["mids"]
+            lookup = self.registry.lookup
+            for coin, price in data.items():
+                symbol = lookup(coin)
+                if symbol is None:
+                    continue
+                self.update(symbol, price=float(price))
+        elif message["channel"] == "l2Book":
+            data = message["data"]
+            symbol = self.registry.lookup(data["coin"])
+            if symbol is None:
+                return
+            bids, asks = data["levels"]
+            book = self.book(symbol)
+            book.snapshot(
+                [(float(level["px"]), float(level["sz"])) for level in bids[:book.depth]],
+                [(float(level["px"]), float(level["sz"])) for level in asks[:book.depth]],
+            )
+            self.write_book(symbol, book)
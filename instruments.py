@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+log = logging.getLogger(__name__)
+
+INSTRUMENT_CACHE_FILE = os.getenv("INSTRUMENT_CACHE_FILE", "")  # JSON of resolved instruments, reloaded on start and editable, empty disables
+
+# Prefixes exchanges put on contracts quoting a multiple of the token, longest first
+SCALE_PREFIXES = (("1000000", 1e6), ("1M", 1e6), ("10000", 1e4), ("1000", 1e3), ("k", 1e3))
+
+def split_scale(symbol):
+    """
+    "1000PEPE" -> ("PEPE", 1000.0), "kPEPE" -> ("PEPE", 1000.0), "BTC" -> ("BTC", 1.0).
+
+    A prefix only counts when an upper-case letter follows it, so "1INCH" and "KAVA"
+    keep their names.
+    """
+    for prefix, scale in SCALE_PREFIXES:
+        if symbol.startswith(prefix) and len(symbol) > len(prefix) and symbol[len(prefix)].isupper():
+            return symbol[len(prefix):], scale
+    return symbol, 1.0
+
+class Instruments:
+    """
+    Canonical instruments shared by every feed.
+
+    Exchanges list the same token under different names and contract scales: 1000 PEPE is
+    "kPEPE" on Hyperliquid and "1000PEPE" elsewhere, both quoting the price of 1000
+    tokens. canonical() maps an exchange's symbol to (name, multiplier), where
+    price * multiplier is the price of one unit of the named instrument, so all feeds
+    write the same row in comparable units.
+
+    Feeds resolve their symbols once per metadata refresh, never per tick. Resolutions
+    are kept per (exchange, symbol) and, with a cache path, saved there and reloaded on
+    start; an entry in the file wins over the prefix rules, so an alias the rules get
+    wrong is fixed by editing it.
+    """
+
+    def __init__(self, path=INSTRUMENT_CACHE_FILE):
+        self.path = path
+        self.entries = {}                  # exchange -> {symbol: [name, multiplier]}
+        self.is_dirty = False
+        if path:
+            self.load()
+
+    def canonical(self, exchange, symbol):
+        entries = self.entries.setdefault(exchange, {})
+        entry = entries.get(symbol)
+        if entry is None:
+            name, scale = split_scale(symbol)
+            entry = entries[symbol] = [name, 1 / scale]
+            self.is_dirty = True
+        return entry[0], entry[1]
+
+    def save(self):
+        """Write the cache if anything was resolved since the last save, keeping entries other processes added."""
+        if not self.path or not self.is_dirty:
+            return
+        entries = self._read() or {}
+        for exchange, symbols in self.entries.items():
+            entries.setdefault(exchange, {}).update(symbols)
+        tmp_path = f"{self.path}.tmp.{os.getpid()}"
+        try:
+            with open(tmp_path, "w") as file:
+                json.dump(entries, file, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            log.error("❌ Failed to save instrument cache to %s: %s", self.path, e)
+            return
+        self.is_dirty = False
+
+    def load(self):
+        entries = self._read()
+        if entries:
+            self.entries = entries
+
+    def _read(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.error("❌ Failed to load instrument cache from %s: %s", self.path, e)
+            return None
+
+instruments = Instruments()
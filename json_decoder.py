@@ -0,0 +1,61 @@
+import json
+import logging
+import os
+
+from dotenv import load_dotenv
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+load_dotenv()
+
+log = logging.getLogger(__name__)
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto")  # auto | msgspec | orjson | json
+
+def _select_backend(name):
+    if name == "auto":
+        return "msgspec" if msgspec else "orjson" if orjson else "json"
+    if name == "msgspec" and msgspec is None or name == "orjson" and orjson is None:
+        log.warning("⚠️ JSON_BACKEND=%s is not installed, falling back to stdlib json", name)
+        return "json"
+    return name
+
+BACKEND = _select_backend(JSON_BACKEND)
+
+if BACKEND == "msgspec":
+    loads = msgspec.json.Decoder().decode
+elif BACKEND == "orjson":
+    loads = orjson.loads
+else:
+    loads = json.loads
+
+def make_decoder(schema=None):
+    """
+    Return a decode(raw) function for one exchange's WebSocket frames.
+
+    schema is a typing description of the frames (TypedDicts, lists, unions). With msgspec
+    it is compiled into a typed decoder that skips every field not declared in the schema,
+    so large ticker arrays only materialize the keys a feed reads. Results are plain dicts
+    and lists either way, so feed code is the same for every backend. Frames that do not
+    match the schema (subscription acks, errors) are decoded generically.
+    """
+    if BACKEND != "msgspec" or schema is None:
+        return loads
+
+    typed_decode = msgspec.json.Decoder(schema).decode
+
+    def decode(raw):
+        try:
+            return typed_decode(raw)
+        except msgspec.ValidationError:
+            return loads(raw)
+
+    return decode
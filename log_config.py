@@ -0,0 +1,108 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_FORMAT = os.getenv("LOG_FORMAT", "compact")  # "compact": human-readable lines with tables, "json": one JSON object per line
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")         # per-module overrides, e.g. "gate_feed=DEBUG,telegram=WARNING"
+
+def attach(data, render):
+    """
+    extra= for a log call carrying structured data, e.g. a diff table.
+
+    The compact format appends render(data) to the line, the JSON format emits data as
+    is; either way the work happens on the listener thread and only when the record
+    passes the level check.
+    """
+    return {"data": data, "render": render}
+
+class CompactFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(prefix)s%(message)s")
+
+    def format(self, record):
+        exchange = getattr(record, "exchange", None)
+        record.prefix = f"[{exchange}] " if exchange is not None else ""
+        line = super().format(record)
+        render = getattr(record, "render", None)
+        if render is not None:
+            line += "\n" + render(record.data)
+        return line
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "t": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        exchange = getattr(record, "exchange", None)
+        if exchange is not None:
+            entry["exchange"] = exchange
+        if hasattr(record, "data"):
+            entry["data"] = record.data
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Enqueue records untouched.
+
+    The stock QueueHandler renders the message in the calling thread; here arguments
+    and attached data are formatted by the listener thread, so the event loop only pays
+    for building the record. Callers must not mutate what they pass after logging it.
+    """
+
+    def prepare(self, record):
+        return record
+
+def parse_levels(levels):
+    """"a=DEBUG,b.c=WARNING" -> {"a": "DEBUG", "b.c": "WARNING"}"""
+    pairs = (item.split("=", 1) for item in levels.split(",") if "=" in item)
+    return {name.strip(): level.strip().upper() for name, level in pairs}
+
+_listener = None
+
+def setup_logging(fmt=LOG_FORMAT, level=LOG_LEVEL, module_levels=LOG_LEVELS):
+    """
+    Route all logging through a queue to a listener thread writing to stdout.
+
+    Blocking stdout writes and formatting happen off the event loop. Safe to call
+    again, e.g. in a spawned worker process; later calls replace the configuration.
+    """
+    global _listener
+    stop_logging()
+
+    sink = logging.StreamHandler(sys.stdout)
+    sink.setFormatter(JsonFormatter() if fmt == "json" else CompactFormatter())
+    records = queue.SimpleQueue()
+    _listener = QueueListener(records, sink, respect_handler_level=False)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(records))
+    root.setLevel(level.upper())
+    for name, module_level in parse_levels(module_levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener.start()
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
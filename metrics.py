@@ -0,0 +1,179 @@
+import logging
+import math
+import os
+from bisect import bisect_left
+
+import asyncio
+from aiohttp import web
+from dotenv import load_dotenv
+
+load_dotenv()
+
+log = logging.getLogger(__name__)
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))                 # /metrics port, 0 disables; feed workers use the ports after it
+LOOP_LAG_INTERVAL = 0.5                    # seconds between event-loop lag probes
+
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+class Histogram:
+    """Fixed upper bounds; observe() increments one preallocated slot and allocates nothing."""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Family:
+    """One metric name with one child per label set. Look children up once, outside the hot path."""
+
+    def __init__(self, name, kind, help, labelnames, make_child):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labelnames = labelnames
+        self.make_child = make_child
+        self.children = {}
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = self.make_child()
+        return child
+
+    def samples(self):
+        for key, child in self.children.items():
+            labels = dict(zip(self.labelnames, key))
+            if self.kind == "histogram":
+                cumulative = 0
+                bounds = [repr(bound) for bound in child.bounds] + ["+Inf"]
+                for bound, count in zip(bounds, child.counts):
+                    cumulative += count
+                    yield "_bucket", {**labels, "le": bound}, cumulative
+                yield "_sum", labels, child.sum
+                yield "_count", labels, child.count
+            else:
+                yield "", labels, child.value
+
+class Collected:
+    """Metric read at scrape time from state the code keeps anyway, so updating it costs nothing."""
+
+    def __init__(self, name, kind, help, collect):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.collect = collect
+
+    def samples(self):
+        for labels, value in self.collect():
+            yield "", labels, value
+
+def _format_value(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(int(value))
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+class MetricsRegistry:
+    """
+    Metrics rendered in the Prometheus text format.
+
+    counter(), gauge() and histogram() return families whose labelled children are
+    plain slotted objects: code keeps the child it needs and updates it with an integer
+    add or one bisect, so instrumentation can stay on in production. collect() exposes
+    values that already exist elsewhere (feed counters, queue sizes) through a callback
+    that only runs when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        if metric.name in self.metrics:
+            return self.metrics[metric.name]
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Family(name, "counter", help, labelnames, Counter))
+
+    def gauge(self, name, help, labelnames=()):
+        return self._add(Family(name, "gauge", help, labelnames, Gauge))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Family(name, "histogram", help, labelnames, lambda: Histogram(buckets)))
+
+    def collect(self, name, kind, help, collect):
+        """Register collect(), returning [(labels dict, value)] when scraped; replaces an earlier one of that name."""
+        self.metrics[name] = Collected(name, kind, help, collect)
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+LOOP_LAG_SECONDS = metrics.histogram("event_loop_lag_seconds", "Delay of event loop wake-ups past their scheduled time").labels()
+
+async def monitor_loop_lag(interval=LOOP_LAG_INTERVAL):
+    """Sleep `interval` repeatedly and record how late each wake-up is."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - started - interval))
+
+async def serve_metrics(port=METRICS_PORT, host=METRICS_HOST, registry=metrics):
+    """Serve GET /metrics on host:port and probe event-loop lag until cancelled."""
+    async def handle_metrics(request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, host, port).start()
+        log.info("✅ Metrics served on http://%s:%s/metrics", host, port)
+        await monitor_loop_lag()
+    finally:
+        await runner.cleanup()
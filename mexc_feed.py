@@ -1,7 +1,7 @@
-import asyncio
-import aiohttp
-import websockets
 import json
+from typing import TypedDict, Union
+
+from exchange_feed import ExchangeFeed
 
 BASE_URL = "https://contract.mexc.com/api/v1/contract"
 PING_URL = f"{BASE_URL}/ping"
@@ -18,144 +18,120 @@ PING_MSG = json.dumps({
   "method": "ping"
 })
 
-INITIAL_STREAM_START_DELAY = 30            # seconds before starting main loop
-UPDATE_DATA_INTERVAL = 60                  # seconds between data updates
-RECONNECT_DELAY = 5                        # seconds before reconnect
 PING_INTERVAL = 30
-
-PRINT_PREFIX = "[mexc]: "
-
-is_feed_available = False
-
-async def check_exchange_health(state):
-    global is_feed_available
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url=PING_URL) as resp:
-                if resp.status != 200:
-                    print(f"{PRINT_PREFIX}❌ Health check failed, status: {resp.status}")
-                    is_feed_available = False
-                    state.clear()
-                    return
-
-                data = await resp.json()
-                
-                if "success" in data and data["success"] == True:
-                    if not is_feed_available:
-                        print(f"{PRINT_PREFIX}✅ Exchange feed is alive.")
-                    is_feed_available = True
-                else:
-                    print(f"{PRINT_PREFIX}❌ Health check returned unexpected format.")
-                    is_feed_available = False
-                    state.clear()
-    except Exception as e:
-        if is_feed_available:
-            print(f"{PRINT_PREFIX}❌ Exchange health check failed:", e)
-        is_feed_available = False
-        state.clear()
-
-async def fetch_tokens(state):
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(url=DETAIL_URL) as resp:
-                if resp.status != 200:
-                    print(f"{PRINT_PREFIX}❌ Failed to fetch meta data:", await resp.text())
-                    return
-                data = (await resp.json())
-                for item in data["data"]:
-                    if item["state"] == 0 and item["isHidden"] == False and item["type"] == 1 and item["quoteCoin"] == "USDT":
-                        symbol = item["baseCoin"]
-                        state.setdefault(symbol, {})
-        except Exception as e:
-            print(f"{PRINT_PREFIX}❌ Error fetching exchange info:", e)
-
-async def fetch_funding_info(state):
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get(url=FUNDING_URL) as resp:
-                if resp.status != 200:
-                    print(f"{PRINT_PREFIX}❌ Failed to fetch meta data:", await resp.text())
-                    return
-            
-                data = await resp.json()
-
-                for item in data["data"]:
-                    if item["symbol"].endswith("_USDT"):
-                        symbol = item["symbol"][:-5]
-                        if symbol in state:
-                            state[symbol].update({
-                                "funding_rate": item["fundingRate"],
-                                "next_funding_time": item["nextSettleTime"],
-                                "funding_interval_hours": item["collectCycle"],
-                            })
-        except Exception as e:
-            print(f"{PRINT_PREFIX}❌ Error fetching funding info:", e)
-
-async def ping_loop(ws):
-    while True:
-        try:
-            await asyncio.sleep(PING_INTERVAL)
-            await ws.send(PING_MSG)
-        except Exception as e:
-            print(f"❌ Ping failed: {e}")
-            break
-
-
-async def periodic_data_refresh(state):
-    while True:
-        await check_exchange_health(state)
-        if is_feed_available:
-          await fetch_tokens(state)
-          await fetch_funding_info(state)
-        await asyncio.sleep(UPDATE_DATA_INTERVAL)
-
-async def process_message(message, state):
-    try:
-        message = json.loads(message)
-        if "channel" in message and message["channel"] == "pong" or message["channel"] == "rs.sub.tickers":
-          return
-        if "channel" in message and message["channel"] == "push.tickers":
-          data = message["data"]
-          for item in data:
-              if item["symbol"].endswith("_USDT") and "lastPrice" in item and item["lastPrice"] > 0:
-                  symbol = item["symbol"][:-5]
-                  if symbol in state:
-                      state[symbol].update({
-                          "price": item["lastPrice"]
-                      })
+DEPTH_LIMITS = (5, 10, 20)                 # sizes sub.depth.full accepts
+
+class MexcTicker(TypedDict, total=False):
+    symbol: str                            # e.g. "BTC_USDT"
+    lastPrice: float
+
+class MexcDepth(TypedDict, total=False):
+    bids: list[list[float]]                # [price, contracts, order count], best first
+    asks: list[list[float]]
+
+class MexcMessage(TypedDict, total=False):
+    channel: str
+    symbol: str                            # depth pushes
+    data: Union[list[MexcTicker], MexcDepth, str, int]
+
+class MexcFeed(ExchangeFeed):
+    name = "mexc"
+    ws_url = WS_URL
+    health_url = PING_URL
+    heartbeat_interval = PING_INTERVAL
+    heartbeat_marker = '"pong"'
+    book_marker = "push.depth.full"
+    message_schema = MexcMessage
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.contract_sizes = {}           # symbol -> base units per contract (contractSize)
+
+    def is_healthy(self, data):
+        return "success" in data and data["success"] == True
+
+    def normalize_symbol(self, raw):
+        return raw[:-5] if raw.endswith("_USDT") else None  # remove "_USDT" suffix
+
+    async def refresh_data(self):
+        loaded = await self.fetch_tokens()
+        await self.fetch_funding_info()
+        return loaded
+
+    async def fetch_tokens(self):
+        data = await self.fetch_json(DETAIL_URL, "meta data")
+        if data is None:
+            return False
+        allowed, denied, contract_sizes = [], [], {}
+        for item in data["data"]:
+            if item["state"] == 0 and item["isHidden"] == False and item["type"] == 1 and item["quoteCoin"] == "USDT":
+                allowed.append(item["symbol"])
+                contract_sizes[item["symbol"]] = item.get("contractSize")
+            else:
+                denied.append(item["symbol"])
+        self.registry.replace(allowed, denied)
+        self.contract_sizes = contract_sizes
+        for contract in allowed:
+            self.update(self.registry.lookup(contract))
+        return True
+
+    async def fetch_funding_info(self):
+        data = await self.fetch_json(FUNDING_URL, "funding data")
+        if data is None:
+            return
+        for item in data["data"]:
+            symbol = self.registry.lookup(item["symbol"])
+            if symbol is not None and self.contains(symbol):
+                self.funding.set_interval(self.exchange, symbol, item["collectCycle"])
+                self.update(
+                    symbol,
+                    funding_rate=item["fundingRate"],
+                    next_funding_time=item.get("nextSettleTime") or self.funding.next_funding_time(self.exchange, symbol),
+                    funding_interval_hours=item["collectCycle"],
+                )
+
+    def subscribe_messages(self):
+        return [PRICE_MSG]
+
+    def book_keys(self):
+        return [contract for contract, contract_size in self.contract_sizes.items() if contract_size]
+
+    def book_subscribe_messages(self, contracts):
+        limit = next((limit for limit in DEPTH_LIMITS if limit >= self.book_depth), DEPTH_LIMITS[-1])
+        return [
+            json.dumps({"method": "sub.depth.full", "param": {"symbol": contract, "limit": limit}})
+            for contract in contracts
+        ]
+
+    async def send_heartbeat(self, ws):
+        await ws.send(PING_MSG)
+
+    def is_pong(self, data):
+        return data.get("channel") == "pong"
+
+    async def process_message(self, ws, message):
+        message = self.decode(message)
+        channel = message.get("channel")
+        if channel in ("rs.sub.tickers", "rs.sub.depth.full"):
+            return
+        if channel == "push.tickers":
+            lookup = self.registry.lookup
+            for item in message["data"]:
+                symbol = lookup(item["symbol"])
+                if symbol is not None and "lastPrice" in item and item["lastPrice"] > 0 and self.contains(symbol):
+                    self.update(symbol, price=item["lastPrice"])
+        elif channel == "push.depth.full":
+            # Full snapshots of the top `limit` levels, sizes in contracts
+            symbol = self.registry.lookup(message["symbol"])
+            contract_size = self.contract_sizes.get(message["symbol"])
+            if symbol is None or not contract_size:
+                return
+            data = message["data"]
+            book = self.book(symbol)
+            book.snapshot(
+                [(level[0], level[1] * contract_size) for level in data["bids"]],
+                [(level[0], level[1] * contract_size) for level in data["asks"]],
+            )
+            self.write_book(symbol, book)
         else:
-            print(f"{PRINT_PREFIX} Not Ticker Message")
-            print(json.dumps(message, indent=4))
-    except Exception as e:
-        print(f"{PRINT_PREFIX}❌ Failed to parse message: {e}")
-
-async def handle_stream(state):
-    await asyncio.sleep(INITIAL_STREAM_START_DELAY)
-    while True:
-        try:
-            async with websockets.connect(
-                WS_URL,
-            ) as ws:
-                await ws.send(PRICE_MSG)
-                ping_task = asyncio.create_task(ping_loop(ws))
-                async for message in ws:
-                    # Skip processing if feed marked unavailable
-                    if not is_feed_available:
-                        await asyncio.sleep(RECONNECT_DELAY)
-                        continue
-                    
-                    await process_message(message, state)
-        except Exception as e:
-            print(f"{PRINT_PREFIX}❌ Connection error: {e}")
-            print(f"{PRINT_PREFIX}Reconnecting in {RECONNECT_DELAY}s...")
-            await asyncio.sleep(RECONNECT_DELAY)
-        finally:
-            if 'ping_task' in locals():
-                ping_task.cancel()
-
-async def mexc_feed(state):
-    await asyncio.gather(
-        periodic_data_refresh(state),
-        handle_stream(state),
-    )
-
+            self.log.debug("Not a ticker message: %s", message)
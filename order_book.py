@@ -0,0 +1,91 @@
+import os
+from array import array
+from bisect import bisect_left
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BOOK_DEPTH = int(os.getenv("BOOK_DEPTH", 10))                   # levels kept per side
+BOOK_NOTIONAL = float(os.getenv("BOOK_NOTIONAL", 1000))         # quote currency executable prices are computed for, 0 = top of book
+
+NAN = float("nan")
+
+class OrderBook:
+    """
+    The best `depth` levels of one symbol's book on one exchange.
+
+    Each side is a pair of parallel arrays of doubles: keys in ascending order and sizes
+    in base units. Asks are keyed by price and bids by negated price, so the best level of
+    either side is at index 0 and a delta finds its level with one bisect. Levels beyond
+    `depth` are dropped, and a side that lost levels that way is marked truncated: its
+    deltas no longer add levels past its current last one, since levels in between may
+    be missing. After deltas remove the best levels the book is shallower, never gapped,
+    until the next snapshot, and executable() reports NaN for sizes it cannot cover.
+    """
+
+    __slots__ = ("depth", "bid_keys", "bid_sizes", "ask_keys", "ask_sizes", "bids_truncated", "asks_truncated")
+
+    def __init__(self, depth=BOOK_DEPTH):
+        self.depth = depth
+        self.bid_keys, self.bid_sizes = array("d"), array("d")
+        self.ask_keys, self.ask_sizes = array("d"), array("d")
+        self.bids_truncated = self.asks_truncated = False
+
+    def snapshot(self, bids, asks):
+        """Replace both sides with (price, size) levels, in any order."""
+        bids = sorted((-price, size) for price, size in bids if size > 0)
+        asks = sorted((price, size) for price, size in asks if size > 0)
+        # A full side may itself be the exchange's cut of a deeper book
+        self.bids_truncated, self.asks_truncated = len(bids) >= self.depth, len(asks) >= self.depth
+        bids, asks = bids[:self.depth], asks[:self.depth]
+        self.bid_keys, self.bid_sizes = array("d", [key for key, _ in bids]), array("d", [size for _, size in bids])
+        self.ask_keys, self.ask_sizes = array("d", [key for key, _ in asks]), array("d", [size for _, size in asks])
+
+    def apply(self, bids, asks):
+        """Apply (price, size) deltas; size 0 removes the level."""
+        truncated = self.bids_truncated
+        for price, size in bids:
+            truncated = self._apply(self.bid_keys, self.bid_sizes, -price, size, truncated)
+        self.bids_truncated = truncated
+        truncated = self.asks_truncated
+        for price, size in asks:
+            truncated = self._apply(self.ask_keys, self.ask_sizes, price, size, truncated)
+        self.asks_truncated = truncated
+
+    def _apply(self, keys, sizes, key, size, truncated):
+        """Apply one delta to a side; return whether the side is truncated afterwards."""
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            if size > 0:
+                sizes[i] = size
+            else:
+                del keys[i], sizes[i]
+        elif size > 0 and (i < len(keys) or not truncated):
+            keys.insert(i, key)
+            sizes.insert(i, size)
+            if len(keys) > self.depth:
+                keys.pop()
+                sizes.pop()
+                return True
+        return truncated
+
+    def executable(self, notional=BOOK_NOTIONAL):
+        """(bid, ask): average prices selling and buying `notional` quote currency would fill at, NaN if the book is too thin."""
+        return _fill_price(self.bid_keys, self.bid_sizes, notional, -1), _fill_price(self.ask_keys, self.ask_sizes, notional, 1)
+
+def _fill_price(keys, sizes, notional, sign):
+    """Volume-weighted price over the best levels until `notional` is filled; price = key * sign."""
+    if not keys:
+        return NAN
+    if notional <= 0:
+        return keys[0] * sign
+    remaining = notional
+    filled = 0.0
+    for key, size in zip(keys, sizes):
+        price = key * sign
+        if price * size >= remaining:
+            return notional / (filled + remaining / price)
+        remaining -= price * size
+        filled += size
+    return NAN
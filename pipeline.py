@@ -1,31 +1,56 @@
+import logging
 import os
 import time
-from collections import defaultdict
 
 import asyncio
 from dotenv import load_dotenv 
 
-from diffs import find_funding_diff_table, find_price_diff_table, print_diff_table
-from telegram import send_detailed_diff_telegram_message
-from asterdex_feed import asterdex_feed
-from hyperliquid_feed import hyperliquid_feed
-from lighter_feed import lighter_feed
-from edgex_feed import edgex_feed
-from extended_feed import extended_feed
-from mexc_feed import mexc_feed
-from gate_feed import gate_feed
+from http_client import HttpClient
+from state_store import MarketStateStore
+from shared_state import SharedMarketStateStore
+from feed_worker import supervise_feed_workers
+from recorder import FeedRecorder
+from tick_log import TickLog
+from update_buffer import UpdateBuffer
+from detector import DIFF_LABELS, DIFF_SCAN_SECONDS, SpreadDetector, diff_checks
+from spread_tracker import SpreadTracker
+from metrics import METRICS_PORT, metrics, serve_metrics
+from log_config import attach, setup_logging
+from tabulate import tabulate
+
+from diffs import format_diff_table
+from telegram import TelegramSender
+from alert_cache import run_alert_cache, save_alert_cache
+from asterdex_feed import AsterdexFeed
+from hyperliquid_feed import HyperliquidFeed
+from lighter_feed import LighterFeed
+from edgex_feed import EdgexFeed
+from extended_feed import ExtendedFeed
+from mexc_feed import MexcFeed
+from gate_feed import GateFeed
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 IS_PRICE_DIFF_ENABLED=int(os.getenv("IS_PRICE_DIFF_ENABLED"))
 IS_FUNDING_DIFF_ENABLED=int(os.getenv("IS_ASTER_ENABLED"))
+IS_EXECUTABLE_DIFF_ENABLED=int(os.getenv("IS_EXECUTABLE_DIFF_ENABLED", 0))  # spread between order book prices for BOOK_NOTIONAL, feeds stream books only when set
 
-START_DELAY=int(os.getenv("START_DELAY"))
 PRINT_INTERVAL=int(os.getenv("PRINT_INTERVAL"))
-CLEAR_STATE_INTERVAL=int(os.getenv("CLEAR_STATE_INTERVAL"))
+STATE_SWEEP_INTERVAL=int(os.getenv("STATE_SWEEP_INTERVAL", 10))  # seconds between evictions of expired state entries
 PRICE_DIFF_PERCENTAGE_THRESHOLD=float(os.getenv("PRICE_DIFF_PERCENTAGE_THRESHOLD"))
 FUNDING_24H_DIFF_PERCENTAGE_THRESHOLD=float(os.getenv("FUNDING_24H_DIFF_PERCENTAGE_THRESHOLD"))
+EXECUTABLE_DIFF_PERCENTAGE_THRESHOLD=float(os.getenv("EXECUTABLE_DIFF_PERCENTAGE_THRESHOLD", 0.3))
 FUNDING_NEXT_TIME_TOLERANCE_MINUTES=float(os.getenv("FUNDING_NEXT_TIME_TOLERANCE_MINUTES"))
+FUNDING_DIFF_MODE=os.getenv("FUNDING_DIFF_MODE", "24h")  # "24h": compare 24h-normalized rates, "carry": expected carry until the next common settlement
+HTTP_STATS_INTERVAL=int(os.getenv("HTTP_STATS_INTERVAL", 300))
+DETECTION_MODE=os.getenv("DETECTION_MODE", "event")  # "event": re-check symbols on update, "poll": full scan every PRINT_INTERVAL
+RECORD_DIR=os.getenv("RECORD_DIR", "")  # when set, raw feed traffic is recorded there for replay.py
+TICK_LOG_DIR=os.getenv("TICK_LOG_DIR", "")  # when set, parsed ticks are logged there in hourly column files (see tick_log.py)
+FEED_PROCESS_GROUPS=os.getenv("FEED_PROCESS_GROUPS", "")  # "": all feeds in this process, "each": one process per feed, or e.g. "aster,hl;mexc,gate"
+
+MIN_READY_FEEDS = 2                        # feeds with loaded metadata before detection starts
 
 IS_ASTER_ENABLED=int(os.getenv("IS_ASTER_ENABLED"))
 IS_EDGEX_ENABLED=int(os.getenv("IS_EDGEX_ENABLED"))
@@ -35,76 +60,159 @@ IS_EXTENDED_ENABLED=int(os.getenv("IS_EXTENDED_ENABLED"))
 IS_GATE_ENABLED=int(os.getenv("IS_GATE_ENABLED"))
 IS_MEXC_ENABLED=int(os.getenv("IS_MEXC_ENABLED"))
 
-async def monitor_prices_diff(state, threshold_percent):
-    """Print tokens with significant price differences periodically."""
-    await asyncio.sleep(START_DELAY)
+async def wait_for_feeds(store):
+    ready = await store.wait_ready(MIN_READY_FEEDS)
+    log.info("✅ Feeds ready: %s. Detection started.", ", ".join(ready))
+
+def report_closed_spreads(telegram, kind, closed):
+    """Log spreads that closed after they alerted, with how long they lasted, and pass them on to Telegram."""
+    for token_data in closed:
+        log.info(
+            "📉 %s %s spread closed after %.1fs (%s ticks, peak %.2f%%, mean %.2f%%)",
+            token_data["token"], kind, token_data["durationSec"], token_data["ticks"], token_data["peakPct"], token_data["meanPct"],
+        )
+    if closed:
+        telegram.send_closed_spreads(closed)
+
+async def monitor_diffs(store, telegram, checks):
+    """Log tokens over each check's threshold every PRINT_INTERVAL, alerting on those whose spread persisted."""
+    await wait_for_feeds(store)
+    scan_seconds = {kind: DIFF_SCAN_SECONDS.labels(kind=kind, mode="poll") for kind, _, _ in checks}
+    trackers = {kind: SpreadTracker(kind) for kind, _, _ in checks}
 
     while True:
         await asyncio.sleep(PRINT_INTERVAL)
-        print(f"\n🕒 {time.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"Checking for tokens with >{threshold_percent}% price difference...")
-        tokens_with_diff = find_price_diff_table(state, threshold_percent)
+        for kind, find_table, threshold_percent in checks:
+            log.debug("Checking for tokens with >%s%% %s difference...", threshold_percent, DIFF_LABELS[kind])
+            started = time.perf_counter()
+            tokens_with_diff = find_table(store, threshold_percent)
+            scan_seconds[kind].observe(time.perf_counter() - started)
+            tracker = trackers[kind]
+            _, closed = tracker.update(tokens_with_diff)
+            report_closed_spreads(telegram, kind, closed)
+            if tokens_with_diff:
+                log.info("📊 Tokens with >%s%% %s difference:", threshold_percent, DIFF_LABELS[kind], extra=attach(tokens_with_diff, format_diff_table))
+                telegram.send_diff_table([token_data for token_data in tokens_with_diff if tracker.is_sustained(token_data["token"])])
+            else:
+                log.info("📊 No tokens with >%s%% %s difference found.", threshold_percent, DIFF_LABELS[kind])
+
+async def monitor_diffs_on_update(store, telegram, checks):
+    """Log tokens as soon as a check's difference has persisted over its threshold, and when it closes."""
+    await wait_for_feeds(store)
+
+    detector = SpreadDetector(store, checks=checks)
+    async for kind, threshold_percent, tokens_with_diff, closed in detector.crossings():
         if tokens_with_diff:
-            print(f"📊 Tokens with >{threshold_percent}% price difference:")
-            print_diff_table(tokens_with_diff)
-            await send_detailed_diff_telegram_message(tokens_with_diff)
-        else:
-            print(f"📊 No tokens with >{threshold_percent}% price difference found.")
+            log.info("📊 Tokens holding >%s%% %s difference:", threshold_percent, DIFF_LABELS[kind], extra=attach(tokens_with_diff, format_diff_table))
+            telegram.send_diff_table(tokens_with_diff)
+        report_closed_spreads(telegram, kind, closed)
 
-async def monitor_24h_funding_rate_diff(state, threshold_percent=0.1):
-    """Print tokens with significant 24h funding rate differences periodically."""
-    await asyncio.sleep(START_DELAY)
-
-    while True:
-        await asyncio.sleep(PRINT_INTERVAL)
-        print(f"\n🕒 {time.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"Checking for tokens with >{threshold_percent}% 24h funding rate difference...")
-        tokens_with_diff = find_funding_diff_table(state, threshold_percent)
-        if tokens_with_diff:
-            print(f"📊 Tokens with >{threshold_percent}% 24h funding rate difference:")
-            print_diff_table(tokens_with_diff)
-            await send_detailed_diff_telegram_message(tokens_with_diff)
-        else:
-            print(f"📊 No tokens with >{threshold_percent}% 24h funding rate difference found.")
+def format_http_stats(rows):
+    headers = ["Host", "Requests", "New conns", "Reused conns", "Reuse%", "Avg ms", "Max ms"]
+    return tabulate(rows, headers=headers, tablefmt="pretty")
 
-async def periodic_clear_state(state):
+async def periodic_http_stats(http):
+    """Log per-host request latency and connection reuse of the shared HTTP client."""
     while True:
-        await asyncio.sleep(CLEAR_STATE_INTERVAL)
-        for key in state:
-            state[key].clear()
-        print(f"\n🕒 {time.strftime('%Y-%m-%d %H:%M:%S')}")
-        print("State sub-dictionaries cleared to prevent memory bloat.")
+        await asyncio.sleep(HTTP_STATS_INTERVAL)
+        log.info("🌐 HTTP client stats:", extra=attach(http.stats_table(), format_http_stats))
+
+def collect_store_metrics(store):
+    metrics.collect("state_symbols_tracked", "gauge", "Symbols with a row in the state store", lambda: [({}, len(store.symbols))])
+    metrics.collect("state_feeds_ready", "gauge", "Feeds with loaded metadata", lambda: [({}, int(store.ready.sum()))])
+
+def feed_process_groups(feed_classes):
+    """Split enabled feed classes into worker process groups according to FEED_PROCESS_GROUPS."""
+    if FEED_PROCESS_GROUPS == "each":
+        return [[feed_class] for feed_class in feed_classes]
+
+    by_name = {feed_class.name: feed_class for feed_class in feed_classes}
+    groups = []
+    for group in FEED_PROCESS_GROUPS.split(";"):
+        names = [name.strip() for name in group.split(",") if name.strip() in by_name]
+        if names:
+            groups.append([by_name.pop(name) for name in names])
+    # Enabled feeds not named in any group get a process each
+    groups += [[feed_class] for feed_class in by_name.values()]
+    return groups
 
 async def main():
-    state = defaultdict(dict)
-
-    tasks = []
-
-    if IS_ASTER_ENABLED:
-        tasks.append(asterdex_feed(state["aster"]))
-    if IS_HL_ENABLED:
-        tasks.append(hyperliquid_feed(state["hl"]))
-    if IS_LIGHTER_ENABLED:
-        tasks.append(lighter_feed(state["lighter"]))
-    if IS_EDGEX_ENABLED:
-        tasks.append(edgex_feed(state["edgex"]))
-    if IS_EXTENDED_ENABLED:
-        tasks.append(extended_feed(state["extended"]))
-    if IS_MEXC_ENABLED:
-        tasks.append(mexc_feed(state["mexc"]))
-    if IS_GATE_ENABLED:
-        tasks.append(gate_feed(state["gate"]))
-
-    if IS_PRICE_DIFF_ENABLED:
-        tasks.append(monitor_prices_diff(state, threshold_percent=PRICE_DIFF_PERCENTAGE_THRESHOLD))
-    if IS_FUNDING_DIFF_ENABLED:
-        tasks.append(monitor_24h_funding_rate_diff(state, threshold_percent=FUNDING_24H_DIFF_PERCENTAGE_THRESHOLD))
-    
-    tasks += [
-        periodic_clear_state(state),
+    setup_logging()
+    feed_classes = [
+        (IS_ASTER_ENABLED, AsterdexFeed),
+        (IS_HL_ENABLED, HyperliquidFeed),
+        (IS_LIGHTER_ENABLED, LighterFeed),
+        (IS_EDGEX_ENABLED, EdgexFeed),
+        (IS_EXTENDED_ENABLED, ExtendedFeed),
+        (IS_MEXC_ENABLED, MexcFeed),
+        (IS_GATE_ENABLED, GateFeed),
     ]
-
-    await asyncio.gather(*tasks)
+    enabled_feed_classes = [feed_class for is_enabled, feed_class in feed_classes if is_enabled]
+
+    exchanges = [feed_class.name for feed_class in enabled_feed_classes]
+    quote_ttl = {feed_class.name: feed_class.quote_ttl for feed_class in enabled_feed_classes}
+    entry_ttl = {feed_class.name: feed_class.entry_ttl for feed_class in enabled_feed_classes}
+    http = HttpClient()
+    await http.start()
+
+    if FEED_PROCESS_GROUPS:
+        # Feeds run in worker processes writing into shared memory; each worker sweeps its own columns
+        store = SharedMarketStateStore.create(exchanges, quote_ttl=quote_ttl, entry_ttl=entry_ttl)
+        tasks = [
+            supervise_feed_workers(store, feed_process_groups(enabled_feed_classes), STATE_SWEEP_INTERVAL, RECORD_DIR, METRICS_PORT, TICK_LOG_DIR, bool(IS_EXECUTABLE_DIFF_ENABLED)),
+            store.watch_versions(),
+        ]
+    else:
+        store = MarketStateStore(exchanges, quote_ttl=quote_ttl, entry_ttl=entry_ttl)
+        updates = UpdateBuffer(store)
+        feeds = [
+            feed_class(
+                store,
+                http,
+                updates=updates,
+                recorder=FeedRecorder(RECORD_DIR, feed_class.name, feed_class.name) if RECORD_DIR else None,
+                ticks=TickLog(TICK_LOG_DIR, feed_class.name, store.symbols) if TICK_LOG_DIR else None,
+                books=bool(IS_EXECUTABLE_DIFF_ENABLED),
+            )
+            for feed_class in enabled_feed_classes
+        ]
+        tasks = [updates.run(), store.run_sweeper(STATE_SWEEP_INTERVAL)] + [feed.run() for feed in feeds]
+
+    telegram = TelegramSender(http)
+    tasks.append(telegram.run())
+    tasks.append(run_alert_cache())
+    collect_store_metrics(store)
+    if METRICS_PORT:
+        tasks.append(serve_metrics(METRICS_PORT))
+
+    funding_threshold = FUNDING_24H_DIFF_PERCENTAGE_THRESHOLD if IS_FUNDING_DIFF_ENABLED else None
+    checks = diff_checks(
+        price_threshold=PRICE_DIFF_PERCENTAGE_THRESHOLD if IS_PRICE_DIFF_ENABLED else None,
+        funding_threshold=funding_threshold if FUNDING_DIFF_MODE != "carry" else None,
+        carry_threshold=funding_threshold if FUNDING_DIFF_MODE == "carry" else None,
+        tolerance_minutes=FUNDING_NEXT_TIME_TOLERANCE_MINUTES,
+        executable_threshold=EXECUTABLE_DIFF_PERCENTAGE_THRESHOLD if IS_EXECUTABLE_DIFF_ENABLED else None,
+    )
+    if checks and DETECTION_MODE == "poll":
+        tasks.append(monitor_diffs(store, telegram, checks))
+    elif checks:
+        tasks.append(monitor_diffs_on_update(store, telegram, checks))
+
+    tasks.append(periodic_http_stats(http))
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        await http.close()
+        save_alert_cache()
+        if FEED_PROCESS_GROUPS:
+            store.close()
+        else:
+            for feed in feeds:
+                if feed.recorder is not None:
+                    feed.recorder.close()
+                if feed.ticks is not None:
+                    feed.ticks.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,55 @@
+import gzip
+import heapq
+import json
+import os
+import time
+
+class FeedRecorder:
+    """
+    Capture one feed's raw traffic for offline replay.
+
+    Every WebSocket frame and every decoded REST response is appended, with its wall-clock
+    receive time, as one JSON line to a gzip file named <exchange>-<start time>.jsonl.gz.
+    REST responses are stored under the label the feed fetched them with ("health" for
+    health checks), which is what the replay driver serves them back by.
+    """
+
+    def __init__(self, directory, feed, exchange):
+        os.makedirs(directory, exist_ok=True)
+        self.feed = feed
+        self.exchange = exchange
+        self.path = os.path.join(directory, f"{exchange}-{time.strftime('%Y%m%d-%H%M%S')}.jsonl.gz")
+        self.file = gzip.open(self.path, "at", encoding="utf-8")
+        self.records = 0
+
+    def _write(self, kind, data, what=None):
+        record = {"t": time.time(), "feed": self.feed, "exchange": self.exchange, "kind": kind, "data": data}
+        if what is not None:
+            record["what"] = what
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.records += 1
+
+    def frame(self, message):
+        if isinstance(message, bytes):
+            message = message.decode()
+        self._write("ws", message)
+
+    def response(self, what, data):
+        self._write("rest", data, what)
+
+    def close(self):
+        self.file.close()
+
+def read_recording(path):
+    """Yield the records of one recording; a file cut short by a crash ends at its last complete line."""
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        try:
+            for line in file:
+                if line.endswith("\n"):
+                    yield json.loads(line)
+        except EOFError:
+            return
+
+def read_recordings(paths):
+    """Yield the records of several recordings merged in receive-time order."""
+    return heapq.merge(*(read_recording(path) for path in paths), key=lambda record: record["t"])
@@ -0,0 +1,170 @@
+"""
+Replay recorded feed traffic offline.
+
+Recorded WebSocket frames go through each feed's own process_message into a
+MarketStateStore, and recorded REST responses are served back to the feed's health and
+refresh hooks, so parser and diff changes can be checked without touching an exchange.
+
+    python replay.py recordings/*.jsonl.gz [--speed 1]
+
+Without --speed frames are replayed as fast as possible.
+"""
+import argparse
+import glob
+import time
+
+import asyncio
+import numpy as np
+
+from asterdex_feed import AsterdexFeed
+from detector import SpreadDetector
+from spread_tracker import SPREAD_MIN_MS, SPREAD_MIN_TICKS
+from diffs import find_funding_diff_table, find_price_diff_table
+from log_config import setup_logging
+from edgex_feed import EdgexFeed
+from extended_feed import ExtendedFeed
+from gate_feed import GateFeed
+from hyperliquid_feed import HyperliquidFeed
+from lighter_feed import LighterFeed
+from mexc_feed import MexcFeed
+from recorder import read_recording, read_recordings
+from state_store import MarketStateStore
+
+FEED_CLASSES = {
+    feed_class.name: feed_class
+    for feed_class in [AsterdexFeed, HyperliquidFeed, LighterFeed, EdgexFeed, ExtendedFeed, MexcFeed, GateFeed]
+}
+
+class ReplaySocket:
+    """Stands in for the WebSocket a feed replies on (pongs, pings); keeps what was sent."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    async def pong(self, data=b""):
+        pass
+
+class ReplayedFeed:
+    """One feed instance driven from recorded traffic instead of the network."""
+
+    def __init__(self, feed_class, store, exchange, updates=None):
+        self.feed = feed_class(store, None, exchange, updates)
+        self.feed.fetch_json = self.fetch_json
+        self.socket = ReplaySocket()
+        self.responses = {}
+        self.needs_refresh = False
+
+    async def fetch_json(self, url, what, method="GET", **kwargs):
+        return self.responses.get(what)
+
+    def response(self, what, data):
+        """Apply a recorded REST response the way ExchangeFeed.check_exchange_health would."""
+        self.responses[what] = data
+        if what != "health":
+            return
+        if self.feed.is_healthy(data):
+            self.feed.set_available(True)
+            self.feed.on_health_data(data)
+            # Live, the refresh follows the health check; its responses are the next records
+            self.needs_refresh = True
+        else:
+            self.feed.set_available(False)
+
+    async def frame(self, message):
+        if self.needs_refresh:
+            self.needs_refresh = False
+            await self.feed.refresh_data()
+        self.feed.messages_received += 1
+        await self.feed.handle_message(self.socket, message)
+
+def recorded_exchanges(paths):
+    """Store columns written by the given recordings; each recording holds one feed."""
+    exchanges = set()
+    for path in paths:
+        for record in read_recording(path):
+            exchanges.add(record["exchange"])
+            break
+    return sorted(exchanges)
+
+async def replay(records, store, speed=None, on_tick=None):
+    """
+    Push records (see recorder.read_recordings) through their feeds into store, which
+    must have a column for every recorded exchange.
+
+    speed=None replays as fast as possible, otherwise at speed times the recorded pace.
+    on_tick(record), when given, is called after each frame has been applied to the store.
+    Returns {exchange: ReplayedFeed}.
+    """
+    feeds = {}
+    start = first = None
+    for record in records:
+        exchange = record["exchange"]
+        replayed = feeds.get(exchange)
+        if replayed is None:
+            replayed = feeds[exchange] = ReplayedFeed(FEED_CLASSES[record["feed"]], store, exchange)
+
+        if speed is not None:
+            if first is None:
+                start, first = time.monotonic(), record["t"]
+            delay = (record["t"] - first) / speed - (time.monotonic() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        if record["kind"] == "rest":
+            replayed.response(record["what"], record["data"])
+        else:
+            await replayed.frame(record["data"])
+            if on_tick is not None:
+                on_tick(record)
+    return feeds
+
+async def main():
+    parser = argparse.ArgumentParser(description="Replay recorded feed traffic through the parsers and diff engine.")
+    parser.add_argument("paths", nargs="+", help="recordings (.jsonl.gz) or glob patterns")
+    parser.add_argument("--speed", type=float, default=None, help="multiple of the recorded pace, default as fast as possible")
+    parser.add_argument("--price-threshold", type=float, default=0.5)
+    parser.add_argument("--funding-threshold", type=float, default=0.1)
+    parser.add_argument("--min-ms", type=float, default=SPREAD_MIN_MS, help="ms a spread must persist before it alerts")
+    parser.add_argument("--min-ticks", type=int, default=SPREAD_MIN_TICKS, help="distinct spread values above threshold before it alerts")
+    args = parser.parse_args()
+    setup_logging()
+
+    paths = sorted({path for pattern in args.paths for path in glob.glob(pattern)})
+    store = MarketStateStore(recorded_exchanges(paths))
+    detector = SpreadDetector(
+        store,
+        price_threshold=args.price_threshold,
+        funding_threshold=args.funding_threshold,
+        min_ms=args.min_ms,
+        min_ticks=args.min_ticks,
+    )
+    crossings = {"price": 0, "funding": 0}
+    durations = {"price": [], "funding": []}
+
+    def on_tick(record):
+        # Recorded receive times drive the spreads' clocks, so persistence matches the live run at any speed
+        for kind, _, table, closed in detector.evaluate(store.pop_dirty(), now=record["t"]):
+            crossings[kind] += len(table)
+            durations[kind].extend(token_data["durationSec"] for token_data in closed)
+
+    started = time.perf_counter()
+    feeds = await replay(read_recordings(paths), store, args.speed, on_tick)
+    elapsed = time.perf_counter() - started
+
+    total = sum(replayed.feed.messages_received for replayed in feeds.values())
+    print(f"Replayed {total} frames from {len(paths)} recordings in {elapsed:.2f}s ({total / elapsed:,.0f} frames/s)")
+    for exchange, replayed in sorted(feeds.items()):
+        feed = replayed.feed
+        print(f"  {exchange:<9} frames {feed.messages_received:>8}  parse errors {feed.parse_errors:>5}  symbols {int(store.present[:len(store.symbols), store.exchange_index[exchange]].sum()):>5}")
+    print(f"Crossings: {crossings['price']} price >{args.price_threshold}%, {crossings['funding']} funding >{args.funding_threshold}%")
+    for kind, closed in durations.items():
+        if closed:
+            print(f"  {kind} spreads closed {len(closed)}, duration p50 {np.percentile(closed, 50):.1f}s, max {max(closed):.1f}s")
+    print(f"At end: {len(find_price_diff_table(store, args.price_threshold))} tokens over the price threshold, "
+          f"{len(find_funding_diff_table(store, args.funding_threshold))} over the funding threshold")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+import random
+import time
+from collections import deque
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+class Backoff:
+    """
+    Capped exponential backoff with jitter.
+
+    The n-th delay is drawn from [d/2, d] with d = min(cap, base * 2**n), so feeds that
+    lost an exchange at the same moment spread their retries out instead of reconnecting
+    in lockstep, and a long outage is retried every `cap` seconds rather than every `base`.
+    """
+
+    def __init__(self, base, cap):
+        self.base = base
+        self.cap = cap
+        self.attempts = 0
+
+    def next_delay(self):
+        delay = min(self.cap, self.base * 2 ** self.attempts)
+        self.attempts += 1
+        return random.uniform(delay / 2, delay)
+
+    def reset(self):
+        self.attempts = 0
+
+class CircuitBreaker:
+    """
+    Circuit breaker around a periodic health call, with a health score over a sliding window.
+
+    `results` keeps the outcome of the last `window` calls and `score` is the share that
+    succeeded. The breaker opens after `failure_threshold` failures in a row, or when a full
+    window scores below `min_score`, so one failed call is only a blip. While open, allow()
+    refuses calls until a backoff delay has passed; then one trial call is let through
+    (half-open), which closes the breaker on success and re-opens it, with a longer
+    delay, on failure.
+    """
+
+    def __init__(self, failure_threshold, min_score, window, reset_timeout, max_reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.min_score = min_score
+        self.results = deque(maxlen=window)
+        self.backoff = Backoff(reset_timeout, max_reset_timeout)
+        self.state = CLOSED
+        self.failures = 0                  # consecutive
+        self.retry_at = 0.0
+
+    @property
+    def score(self):
+        return sum(self.results) / len(self.results) if self.results else 1.0
+
+    @property
+    def is_open(self):
+        return self.state != CLOSED
+
+    def retry_in(self, now=None):
+        """Seconds until an open breaker lets a trial call through."""
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.retry_at - now)
+
+    def allow(self, now=None):
+        if self.state == OPEN and self.retry_in(now) == 0:
+            self.state = HALF_OPEN
+        return self.state != OPEN
+
+    def record(self, success, now=None):
+        """Record one call's outcome."""
+        now = time.monotonic() if now is None else now
+        self.results.append(success)
+        self.failures = 0 if success else self.failures + 1
+
+        if self.state == HALF_OPEN:
+            if success:
+                self.state = CLOSED
+                self.backoff.reset()
+                self.results.clear()
+            else:
+                self._open(now)
+        elif not success and (
+            self.failures >= self.failure_threshold
+            or (len(self.results) == self.results.maxlen and self.score < self.min_score)
+        ):
+            self._open(now)
+
+    def _open(self, now):
+        self.state = OPEN
+        self.retry_at = now + self.backoff.next_delay()
@@ -0,0 +1,210 @@
+import multiprocessing
+from multiprocessing import shared_memory
+
+import asyncio
+import numpy as np
+
+from state_store import FIELDS, MATRICES, TIMESTAMPS, MarketStateStore
+
+SHARED_SYMBOL_CAPACITY = 4096              # rows; the shared block cannot grow after creation
+SYMBOL_NAME_BYTES = 32                     # max encoded length of a symbol name
+SNAPSHOT_RETRIES = 10                      # re-reads of cells caught mid-write before giving up on them
+VERSION_POLL_INTERVAL = 0.02               # seconds between checks for rows written by other processes
+
+def _layout(n_exchanges, capacity):
+    """Return [(name, dtype, shape, offset)] and total size of the shared block."""
+    matrix = (capacity, n_exchanges)
+    arrays = [(name, np.float64, matrix) for name in FIELDS + TIMESTAMPS] + [
+        ("present", np.bool_, matrix),
+        ("versions", np.uint64, matrix),
+        ("ready", np.bool_, (n_exchanges,)),
+        ("symbol_names", f"S{SYMBOL_NAME_BYTES}", (capacity,)),
+        ("symbol_count", np.int64, (1,)),
+    ]
+    layout, offset = [], 0
+    for name, dtype, shape in arrays:
+        offset = (offset + 7) // 8 * 8
+        layout.append((name, dtype, shape, offset))
+        offset += int(np.dtype(dtype).itemsize * np.prod(shape))
+    return layout, offset
+
+class SharedMarketStateStore(MarketStateStore):
+    """
+    MarketStateStore whose matrices live in a multiprocessing.shared_memory block.
+
+    Feed worker processes write their own exchange columns and the main process reads
+    every column without any serialization. Each (symbol, exchange) cell has a version
+    counter used as a seqlock: the writer makes it odd before writing and even after, and
+    readers retry cells whose version was odd or changed while they were copied. The
+    version counters also mark which rows changed, so the main process finds dirty rows
+    without the workers signalling it.
+
+    Symbol rows are assigned under a shared lock and recorded in a shared name table,
+    so every process maps a symbol to the same row. Each exchange column must have a
+    single writer process.
+
+    The main process calls create(); workers call attach() with its spec().
+    """
+
+    def __init__(self, exchanges, shm, lock, capacity, quote_ttl=None, entry_ttl=None, owner=False):
+        self.shm = shm
+        self.lock = lock
+        self.owner = owner
+        super().__init__(exchanges, capacity, quote_ttl, entry_ttl)
+        self._seen_versions = self.versions.copy()
+
+    @classmethod
+    def create(cls, exchanges, capacity=SHARED_SYMBOL_CAPACITY, quote_ttl=None, entry_ttl=None):
+        exchanges = list(exchanges)
+        _, size = _layout(len(exchanges), capacity)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        lock = multiprocessing.get_context("spawn").Lock()
+        store = cls(exchanges, shm, lock, capacity, quote_ttl, entry_ttl, owner=True)
+        for name in FIELDS:
+            getattr(store, name)[:] = np.nan
+        return store
+
+    @classmethod
+    def attach(cls, spec):
+        name, exchanges, capacity, lock, quote_ttl, entry_ttl = spec
+        # Spawned workers share the creating process's resource tracker, which unlinks the block only if that process dies
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(exchanges, shm, lock, capacity, quote_ttl, entry_ttl)
+
+    def spec(self):
+        """Picklable arguments for attach() in another process."""
+        quote_ttl = dict(zip(self.exchanges, self.quote_ttl.tolist()))
+        entry_ttl = dict(zip(self.exchanges, self.entry_ttl.tolist()))
+        return self.shm.name, self.exchanges, self.capacity, self.lock, quote_ttl, entry_ttl
+
+    def claim_columns(self, exchanges):
+        """Make the versions of these columns even again, in case their previous writer process died mid-write."""
+        cols = [self.exchange_index[exchange] for exchange in exchanges]
+        self.versions[:, cols] += self.versions[:, cols] % 2
+
+    def close(self):
+        for name, _, _, _ in _layout(len(self.exchanges), self.capacity)[0]:
+            setattr(self, name, None)
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        layout, _ = _layout(len(self.exchanges), capacity)
+        for name, dtype, shape, offset in layout:
+            setattr(self, name, np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset))
+        self.dirty = np.zeros(capacity, dtype=bool)  # process-local, unused across processes
+
+    def _grow(self):
+        raise RuntimeError(f"Shared state is full ({self.capacity} symbols), raise SHARED_SYMBOL_CAPACITY")
+
+    def _sync_symbols(self):
+        """Pick up rows that other processes registered since the last call."""
+        count = int(self.symbol_count[0])
+        for row in range(len(self.symbols), count):
+            symbol = self.symbol_names[row].decode()
+            self.symbols.append(symbol)
+            self.symbol_index[symbol] = row
+
+    def _row(self, symbol):
+        row = self.symbol_index.get(symbol)
+        if row is not None:
+            return row
+        with self.lock:
+            self._sync_symbols()
+            row = self.symbol_index.get(symbol)
+            if row is None:
+                row = len(self.symbols)
+                if row == self.capacity:
+                    self._grow()
+                self.symbol_names[row] = symbol.encode()
+                self.symbol_count[0] = row + 1
+                self.symbols.append(symbol)
+                self.symbol_index[symbol] = row
+        return row
+
+    def update(self, exchange, instrument, **fields):
+        row = self._row(instrument) if isinstance(instrument, str) else instrument
+        col = self.exchange_index[exchange]
+        self.versions[row, col] += 1
+        try:
+            super().update(exchange, row, **fields)
+        finally:
+            self.versions[row, col] += 1
+
+    def contains(self, exchange, instrument):
+        self._sync_symbols()
+        return super().contains(exchange, instrument)
+
+    def mark_stale(self, exchange):
+        col = self.exchange_index[exchange]
+        self.versions[:, col] += 1
+        try:
+            super().mark_stale(exchange)
+        finally:
+            self.versions[:, col] += 1
+
+    def sweep(self, now=None, exchanges=None):
+        self._sync_symbols()
+        return super().sweep(now, exchanges)
+
+    def _evict(self, rows, cols):
+        self.versions[rows, cols] += 1
+        try:
+            super()._evict(rows, cols)
+        finally:
+            self.versions[rows, cols] += 1
+
+    def _mark_dirty(self, rows, cols):
+        # A version step without a data change, so the reading process re-checks the rows
+        self.versions[rows, cols] += 2
+        super()._mark_dirty(rows, cols)
+
+    def view(self):
+        """Consistent copy of the populated rows, see MarketStateStore.view()."""
+        self._sync_symbols()
+        n = len(self.symbols)
+
+        before = self.versions[:n].copy()
+        matrices = {name: getattr(self, name)[:n].copy() for name in MATRICES}
+        after = self.versions[:n]
+        torn = (before != after) | (before % 2 == 1)
+
+        for _ in range(SNAPSHOT_RETRIES):
+            if not torn.any():
+                break
+            rows, cols = np.nonzero(torn)
+            before = self.versions[rows, cols]
+            for name in MATRICES:
+                matrices[name][rows, cols] = getattr(self, name)[rows, cols]
+            after = self.versions[rows, cols]
+            retry = (before != after) | (before % 2 == 1)
+            torn[:] = False
+            torn[rows[retry], cols[retry]] = True
+        return self.symbols, matrices
+
+    def pop_dirty(self):
+        """Return the rows any process wrote since the previous call."""
+        self._sync_symbols()
+        n = len(self.symbols)
+        versions = self.versions[:n].copy()
+        rows = np.flatnonzero((versions != self._seen_versions[:n]).any(axis=1))
+        self._seen_versions[:n] = versions
+        self.changed.clear()
+        return rows
+
+    async def wait_ready(self, count, interval=VERSION_POLL_INTERVAL):
+        """Poll the shared ready flags, which worker processes set."""
+        count = min(count, len(self.exchanges))
+        while self.ready.sum() < count:
+            await asyncio.sleep(interval)
+        return [exchange for exchange, ready in zip(self.exchanges, self.ready) if ready]
+
+    async def watch_versions(self, interval=VERSION_POLL_INTERVAL):
+        """Set `changed` whenever another process wrote a row, so SpreadDetector works across processes."""
+        while True:
+            await asyncio.sleep(interval)
+            n = int(self.symbol_count[0])
+            if n and not np.array_equal(self.versions[:n], self._seen_versions[:n]):
+                self.changed.set()
@@ -0,0 +1,149 @@
+import os
+import time
+from array import array
+
+from dotenv import load_dotenv
+
+from alert_cache import ALERT_REFIRE_GROWTH_PERCENT, spread_percent
+from metrics import metrics
+
+load_dotenv()
+
+SPREAD_MIN_MS = float(os.getenv("SPREAD_MIN_MS", 1000))        # ms a spread must stay open before it alerts, 0 disables
+SPREAD_MIN_TICKS = int(os.getenv("SPREAD_MIN_TICKS", 3))       # distinct spread values above threshold before it alerts, 0 disables
+SPREAD_WINDOW = int(os.getenv("SPREAD_WINDOW", 64))            # latest spread samples kept per open spread for its statistics
+
+DURATION_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 14400)
+
+SPREAD_DURATION_SECONDS = metrics.histogram("spread_duration_seconds", "Time alerted spreads stayed above threshold", ("kind",), DURATION_BUCKETS)
+SPREADS_DISCARDED = metrics.counter("spreads_discarded_total", "Spreads that closed before they persisted long enough to alert", ("kind",))
+
+OPENED, SUSTAINED = 1, 2                   # closed spreads have no entry
+
+NAN = float("nan")
+
+class Spread:
+    """One token's spread while it is above threshold, with its latest samples in a ring buffer."""
+
+    __slots__ = ("state", "opened_at", "ticks", "peak", "samples", "count", "data", "last", "alerted")
+
+    def __init__(self, now, window):
+        self.state = OPENED
+        self.opened_at = now
+        self.ticks = 0
+        self.peak = 0.0
+        self.samples = array("d", [NAN]) * window
+        self.count = 0
+        self.data = None
+        self.last = 0.0
+        self.alerted = 0.0                 # spread percent of the last alert
+
+    def observe(self, data, spread):
+        # Re-evaluations of a row whose other fields changed repeat the same spread; only a new value is a tick
+        self.data = data
+        if self.count and spread == self.last:
+            return
+        self.samples[self.count % len(self.samples)] = spread
+        self.count += 1
+        self.ticks += 1
+        self.peak = max(self.peak, spread)
+        self.last = spread
+
+    @property
+    def mean(self):
+        samples = self.samples[:self.count] if self.count < len(self.samples) else self.samples
+        return sum(samples) / len(samples)
+
+class SpreadTracker:
+    """
+    Per-token spread state machine for one diff kind: closed -> opened -> sustained -> closed.
+
+    update() takes a diff table (tokens above threshold) and the tokens it evaluated. A
+    token entering the table opens a spread; it becomes sustained, and alerts, once it
+    took min_ticks distinct values above threshold and stayed open for min_ms. A token
+    evaluated but missing from the table closes its spread: sustained ones are reported
+    with their duration, peak and mean over the last `window` samples, shorter ones are
+    discarded as glitches (a stale last price, one illiquid print). Only open spreads are
+    held, so each update costs a dict lookup per evaluated token.
+
+    A sustained spread alerts again while it stays open once it has grown by
+    refire_growth_percent since its last alert, the same hysteresis the alert cache
+    applies within its cooldown. A criterion set to 0 is disabled; with both disabled a
+    spread alerts when it opens. Samples, ticks and the mean count distinct values only,
+    not re-evaluations that left the spread unchanged.
+    """
+
+    def __init__(
+        self,
+        kind,
+        min_ms=SPREAD_MIN_MS,
+        min_ticks=SPREAD_MIN_TICKS,
+        window=SPREAD_WINDOW,
+        refire_growth_percent=ALERT_REFIRE_GROWTH_PERCENT,
+    ):
+        self.kind = kind
+        self.min_seconds = min_ms / 1000
+        self.min_ticks = min_ticks
+        self.window = window
+        self.refire_growth = refire_growth_percent / 100
+        self.open = {}                     # token -> Spread
+        self.duration_seconds = SPREAD_DURATION_SECONDS.labels(kind=kind)
+        self.discarded = SPREADS_DISCARDED.labels(kind=kind)
+
+    def _persisted(self, spread, now):
+        return spread.ticks >= self.min_ticks and now - spread.opened_at >= self.min_seconds
+
+    def update(self, table, evaluated=None, now=None):
+        """
+        Advance the tokens in `evaluated` (every open token when None) by one evaluation.
+
+        Returns (alerts, closed): entries of spreads that became sustained now or grew
+        past their re-alert level, largest first, and the last entries of sustained
+        spreads that closed, with "durationSec", "ticks", "peakPct" and "meanPct" added.
+        Open spreads that were not re-evaluated still become sustained once they are old
+        enough.
+        """
+        now = time.time() if now is None else now
+        flagged = set()
+        for data in table:
+            token = data["token"]
+            flagged.add(token)
+            spread = self.open.get(token)
+            if spread is None:
+                spread = self.open[token] = Spread(now, self.window)
+            spread.observe(data, spread_percent(data))
+
+        closed = []
+        for token in list(self.open) if evaluated is None else [token for token in evaluated if token in self.open]:
+            if token in flagged:
+                continue
+            spread = self.open.pop(token)
+            if spread.state != SUSTAINED:
+                self.discarded.inc()
+                continue
+            duration = now - spread.opened_at
+            self.duration_seconds.observe(duration)
+            closed.append({
+                **spread.data,
+                "durationSec": round(duration, 3),
+                "ticks": spread.ticks,
+                "peakPct": round(spread.peak, 4),
+                "meanPct": round(spread.mean, 4),
+            })
+
+        alerts = []
+        for spread in self.open.values():
+            if spread.state == OPENED:
+                if not self._persisted(spread, now):
+                    continue
+                spread.state = SUSTAINED
+            elif not self.refire_growth or spread.last < spread.alerted * (1 + self.refire_growth):
+                continue
+            spread.alerted = spread.last
+            alerts.append(spread.data)
+        alerts.sort(key=spread_percent, reverse=True)
+        return alerts, closed
+
+    def is_sustained(self, token):
+        spread = self.open.get(token)
+        return spread is not None and spread.state == SUSTAINED
@@ -0,0 +1,234 @@
+import time
+
+import asyncio
+import numpy as np
+
+INITIAL_SYMBOL_CAPACITY = 1024             # rows preallocated before the first grow
+SWEEP_INTERVAL = 10                        # seconds between passes of the expiry sweeper
+
+FIELDS = ("price", "funding_rate", "funding_interval_hours", "next_funding_time", "bid", "ask")
+TIMESTAMPS = ("updated_at", "quoted_at", "booked_at")
+MATRICES = FIELDS + TIMESTAMPS + ("present",)
+
+def _differs(value, current):
+    """value != current, except that NaN replacing NaN (an empty book side) is no change."""
+    return value != current and (value == value or current == current)
+
+class MarketStateStore:
+    """
+    Columnar market state shared by all feeds.
+
+    Every field is a (symbols x exchanges) float64 matrix, missing values are NaN.
+    Exchanges get a column at construction, symbols get a row on first use; the row is the
+    symbol's instrument id (see instrument()), so feeds resolve names once per metadata
+    refresh and write with update() by id. Diff engines read whole matrices through view().
+
+    Rows whose values changed are marked dirty and the `changed` event is set, so a
+    detector can wait for updates and re-evaluate only those rows via pop_dirty().
+
+    bid and ask are the prices a feed's order book can execute the configured notional
+    at (see order_book.py), NaN where the book is too thin or not streamed.
+
+    Each entry records when any field (updated_at), the price (quoted_at) and bid/ask
+    (booked_at) were last written. A price or book older than its exchange's quote_ttl
+    is stale and diff engines skip it; sweep() evicts entries nothing was written to within their exchange's entry_ttl.
+    Both TTLs are {exchange: seconds}, exchanges left out never expire.
+
+    Feeds call mark_ready() once their metadata is loaded; wait_ready() lets detectors
+    start as soon as enough exchanges can be compared.
+    """
+
+    def __init__(self, exchanges, capacity=INITIAL_SYMBOL_CAPACITY, quote_ttl=None, entry_ttl=None):
+        self.exchanges = list(exchanges)
+        self.exchange_index = {name: col for col, name in enumerate(self.exchanges)}
+        self.quote_ttl = self._per_exchange(quote_ttl)
+        self.entry_ttl = self._per_exchange(entry_ttl)
+        self._swept_at = 0.0
+        self.symbols = []
+        self.symbol_index = {}
+        self.changed = asyncio.Event()
+        self.readiness_changed = asyncio.Event()
+        self.ready = np.zeros(len(self.exchanges), dtype=bool)
+        self._allocate(capacity)
+
+    def _per_exchange(self, seconds):
+        seconds = seconds or {}
+        return np.array([seconds.get(name, np.inf) for name in self.exchanges], dtype=float)
+
+    def _allocate(self, capacity):
+        shape = (capacity, len(self.exchanges))
+        self.capacity = capacity
+        self.price = np.full(shape, np.nan)
+        self.funding_rate = np.full(shape, np.nan)
+        self.funding_interval_hours = np.full(shape, np.nan)
+        self.next_funding_time = np.full(shape, np.nan)  # ms since epoch
+        self.bid = np.full(shape, np.nan)                # executable sell price for the book notional
+        self.ask = np.full(shape, np.nan)                # executable buy price for the book notional
+        self.updated_at = np.zeros(shape)                # seconds since epoch of the last write, 0 = never
+        self.quoted_at = np.zeros(shape)                 # seconds since epoch of the last price write, 0 = never
+        self.booked_at = np.zeros(shape)                 # seconds since epoch of the last bid/ask write, 0 = never
+        self.present = np.zeros(shape, dtype=bool)
+        self.dirty = np.zeros(capacity, dtype=bool)
+
+    def _grow(self):
+        old = {name: getattr(self, name) for name in MATRICES + ("dirty",)}
+        self._allocate(self.capacity * 2)
+        for name, array in old.items():
+            getattr(self, name)[:len(array)] = array
+
+    def _row(self, symbol):
+        row = self.symbol_index.get(symbol)
+        if row is None:
+            row = len(self.symbols)
+            if row == self.capacity:
+                self._grow()
+            self.symbols.append(symbol)
+            self.symbol_index[symbol] = row
+        return row
+
+    def instrument(self, symbol):
+        """Instrument id of symbol: its row, assigned on first use and stable for the store's lifetime."""
+        return self._row(symbol)
+
+    def _existing_row(self, instrument):
+        return self.symbol_index.get(instrument) if isinstance(instrument, str) else instrument
+
+    def update(self, exchange, instrument, price=None, funding_rate=None, funding_interval_hours=None, next_funding_time=None, bid=None, ask=None):
+        """Write the given fields for (exchange, instrument id or symbol); fields left as None keep their value."""
+        col = self.exchange_index[exchange]
+        row = self._row(instrument) if isinstance(instrument, str) else instrument
+        changed = not self.present[row, col]
+        now = time.time()
+
+        if price is not None:
+            if price != self.price[row, col]:
+                self.price[row, col] = price
+                changed = True
+            self.quoted_at[row, col] = now
+        if funding_rate is not None and funding_rate != self.funding_rate[row, col]:
+            self.funding_rate[row, col] = funding_rate
+            changed = True
+        if funding_interval_hours is not None and funding_interval_hours != self.funding_interval_hours[row, col]:
+            self.funding_interval_hours[row, col] = funding_interval_hours
+            changed = True
+        if next_funding_time is not None:
+            self.next_funding_time[row, col] = next_funding_time
+        if bid is not None or ask is not None:
+            if bid is not None and _differs(bid, self.bid[row, col]):
+                self.bid[row, col] = bid
+                changed = True
+            if ask is not None and _differs(ask, self.ask[row, col]):
+                self.ask[row, col] = ask
+                changed = True
+            self.booked_at[row, col] = now
+
+        self.present[row, col] = True
+        self.updated_at[row, col] = now
+
+        if changed:
+            self.dirty[row] = True
+            self.changed.set()
+
+    def contains(self, exchange, instrument):
+        row = self._existing_row(instrument)
+        return row is not None and bool(self.present[row, self.exchange_index[exchange]])
+
+    def get(self, exchange, instrument):
+        """Return {field: value} for one entry (NaN fields omitted), or None if absent."""
+        if not self.contains(exchange, instrument):
+            return None
+        row, col = self._existing_row(instrument), self.exchange_index[exchange]
+        entry = {}
+        for name in FIELDS:
+            value = getattr(self, name)[row, col]
+            if not np.isnan(value):
+                entry[name] = float(value)
+        return entry
+
+    def mark_stale(self, exchange):
+        """
+        Age the exchange's prices and books past quote_ttl without deleting them.
+
+        Diff engines skip the entries until the feed writes them again; sweep() still
+        evicts them once nothing was written within entry_ttl.
+        """
+        col = self.exchange_index[exchange]
+        self.quoted_at[:, col] = 0
+        self.booked_at[:, col] = 0
+        self.dirty |= self.present[:, col]
+        self.changed.set()
+
+    def sweep(self, now=None, exchanges=None):
+        """
+        Evict expired entries and mark dirty the rows whose price or book went stale since the
+        previous sweep, so detectors re-check them. Only the given exchanges' columns are
+        touched, all by default. Returns the number of evicted entries.
+        """
+        now = time.time() if now is None else now
+        n = len(self.symbols)
+        quote_cutoff = now - self.quote_ttl
+        columns = np.ones(len(self.exchanges), dtype=bool)
+        if exchanges is not None:
+            columns[:] = False
+            columns[[self.exchange_index[exchange] for exchange in exchanges]] = True
+
+        present = self.present[:n] & columns
+        expired = present & (self.updated_at[:n] < now - self.entry_ttl)
+        previous_cutoff = self._swept_at - self.quote_ttl
+        quoted, booked = self.quoted_at[:n], self.booked_at[:n]
+        went_stale = present & ~expired & (
+            ((quoted < quote_cutoff) & (quoted >= previous_cutoff)) | ((booked < quote_cutoff) & (booked >= previous_cutoff))
+        )
+        self._swept_at = now
+
+        self._evict(*np.nonzero(expired))
+        self._mark_dirty(*np.nonzero(went_stale))
+        return int(expired.sum())
+
+    def _evict(self, rows, cols):
+        for name in FIELDS:
+            getattr(self, name)[rows, cols] = np.nan
+        for name in TIMESTAMPS:
+            getattr(self, name)[rows, cols] = 0
+        self.present[rows, cols] = False
+        self._mark_dirty(rows, cols)
+
+    def _mark_dirty(self, rows, cols):
+        if len(rows):
+            self.dirty[rows] = True
+            self.changed.set()
+
+    async def run_sweeper(self, interval=SWEEP_INTERVAL, exchanges=None):
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep(exchanges=exchanges)
+
+    def mark_ready(self, exchange):
+        self.ready[self.exchange_index[exchange]] = True
+        self.readiness_changed.set()
+
+    async def wait_ready(self, count):
+        """Wait until `count` exchanges (at most all of them) are ready; return the ready ones."""
+        count = min(count, len(self.exchanges))
+        while self.ready.sum() < count:
+            self.readiness_changed.clear()
+            await self.readiness_changed.wait()
+        return [exchange for exchange, ready in zip(self.exchanges, self.ready) if ready]
+
+    def pop_dirty(self):
+        """Return the rows changed since the previous call and reset their dirty flag."""
+        rows = np.flatnonzero(self.dirty[:len(self.symbols)])
+        self.dirty[rows] = False
+        self.changed.clear()
+        return rows
+
+    def view(self):
+        """
+        Zero-copy views of the populated rows.
+
+        Returns:
+            (symbols, {field: ndarray[n_symbols, n_exchanges]}) for FIELDS, TIMESTAMPS and "present".
+        """
+        n = len(self.symbols)
+        matrices = {name: getattr(self, name)[:n] for name in MATRICES}
+        return self.symbols, matrices
@@ -0,0 +1,62 @@
+from instruments import instruments as default_instruments
+
+_UNKNOWN = object()
+
+class SymbolRegistry:
+    """
+    One feed's map from raw exchange market names to instrument ids.
+
+    `symbols` maps raw name -> instrument id (the state store row of the canonical
+    instrument), or -> None for markets the feed skips (delisted, not trading, other
+    quote currencies), so the hot loop resolves and filters an item with a single dict
+    lookup. replace() installs the allow/deny sets from a metadata refresh as a new dict
+    in one assignment (assign() does the same for a mapping the exchange provides), so
+    entries never accumulate across refreshes.
+    Markets missing from the last refresh are resolved on first sight and cached until
+    the next one.
+
+    normalize(raw) gives the exchange's own symbol (e.g. "kPEPE"), which Instruments
+    maps to the canonical one ("PEPE"); `multipliers` holds instrument id -> price
+    multiplier for the scaled contracts only.
+    """
+
+    def __init__(self, exchange, normalize, instrument_id, instruments=default_instruments):
+        self.exchange = exchange
+        self.normalize = normalize
+        self.instrument_id = instrument_id
+        self.instruments = instruments
+        self.symbols = {}
+        self.multipliers = {}
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def _resolve(self, symbol, multipliers):
+        if symbol is None:
+            return None
+        name, multiplier = self.instruments.canonical(self.exchange, symbol)
+        instrument = self.instrument_id(name)
+        if multiplier != 1:
+            multipliers[instrument] = multiplier
+        return instrument
+
+    def replace(self, allowed, denied=()):
+        multipliers = {}
+        symbols = {raw: self._resolve(self.normalize(raw), multipliers) for raw in allowed}
+        symbols.update(dict.fromkeys(denied))
+        self.symbols, self.multipliers = symbols, multipliers
+        self.instruments.save()
+
+    def assign(self, names):
+        """Install raw key -> exchange symbol (None to skip) as given by the exchange."""
+        multipliers = {}
+        symbols = {raw: self._resolve(symbol, multipliers) for raw, symbol in names.items()}
+        self.symbols, self.multipliers = symbols, multipliers
+        self.instruments.save()
+
+    def lookup(self, raw):
+        """Instrument id for raw, or None if the feed skips that market."""
+        instrument = self.symbols.get(raw, _UNKNOWN)
+        if instrument is _UNKNOWN:
+            instrument = self.symbols[raw] = self._resolve(self.normalize(raw), self.multipliers)
+        return instrument
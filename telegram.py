@@ -1,37 +1,157 @@
 # telegram_utils.py
+import logging
 import os
+from collections import deque
 from datetime import datetime, timezone
 
-import aiohttp
 import asyncio
 
 from dotenv import load_dotenv
 
 from alert_cache import should_send_alert
+from metrics import metrics
+from rate_limit import TokenBucket
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+TELEGRAM_MESSAGES_PER_MINUTE = float(os.getenv("TELEGRAM_MESSAGES_PER_MINUTE", 20))  # Telegram allows ~20/min in a group chat
+TELEGRAM_BURST = int(os.getenv("TELEGRAM_BURST", 3))                                 # messages sent back to back before the rate applies
+TELEGRAM_QUEUE_SIZE = int(os.getenv("TELEGRAM_QUEUE_SIZE", 500))                     # queued posts, oldest dropped first
+TELEGRAM_MAX_RETRIES = 5                   # attempts after a network error or 5xx before a message is dropped
+TELEGRAM_RETRY_DELAY = 1                   # seconds before the first retry, doubled on each further one
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096         # Telegram's limit on one message's text
+TELEGRAM_SPREAD_CLOSED = int(os.getenv("TELEGRAM_SPREAD_CLOSED", 1))                 # report when an alerted spread closes, with its duration
+
+class TelegramSender:
+    """
+    Background delivery of alert posts to one Telegram chat.
+
+    Detection loops call send() or send_diff_table(), which only queue posts. run()
+    delivers them: it waits for a token-bucket slot, merges as many queued posts as fit
+    in one message and sends it. A 429 answer pauses the bucket for its retry_after;
+    network errors and 5xx answers are retried with exponential backoff. The queue is
+    bounded and drops the oldest post when full.
+    """
+
+    def __init__(
+        self,
+        http,
+        bot_token=TELEGRAM_BOT_TOKEN,
+        chat_id=TELEGRAM_CHAT_ID,
+        messages_per_minute=TELEGRAM_MESSAGES_PER_MINUTE,
+        burst=TELEGRAM_BURST,
+        queue_size=TELEGRAM_QUEUE_SIZE,
+    ):
+        self.http = http
+        self.chat_id = chat_id
+        self.url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        self.enabled = bool(bot_token and chat_id)
+        self.bucket = TokenBucket(messages_per_minute / 60, burst)
+        self.pending = deque(maxlen=queue_size)
+        self.ready = asyncio.Event()
+
+        # Metrics
+        self.posts_queued = 0
+        self.posts_dropped = 0
+        self.messages_sent = 0
+        self.messages_failed = 0
+        self.rate_limited = 0
+        self.collect_metrics()
+
+    def collect_metrics(self):
+        for name, kind, help, read in (
+            ("telegram_posts_queued_total", "counter", "Alert posts queued for delivery", lambda: self.posts_queued),
+            ("telegram_posts_dropped_total", "counter", "Alert posts dropped from a full queue", lambda: self.posts_dropped),
+            ("telegram_posts_pending", "gauge", "Alert posts waiting for delivery", lambda: len(self.pending)),
+            ("telegram_messages_sent_total", "counter", "Telegram messages delivered", lambda: self.messages_sent),
+            ("telegram_messages_failed_total", "counter", "Telegram messages given up on", lambda: self.messages_failed),
+            ("telegram_rate_limited_total", "counter", "429 answers from Telegram", lambda: self.rate_limited),
+        ):
+            metrics.collect(name, kind, help, lambda read=read: [({}, read())])
+
+    def send(self, post):
+        if not self.enabled:
+            return
+        if len(self.pending) == self.pending.maxlen:
+            self.posts_dropped += 1
+        self.pending.append(post)
+        self.posts_queued += 1
+        self.ready.set()
+
+    def send_diff_table(self, diff_table):
+        """Queue a detailed diff table, one post per token still out of its alert cooldown."""
+        for post in format_diff_for_telegram(diff_table):
+            self.send(post)
+
+    def send_closed_spreads(self, closed):
+        """Queue posts listing spreads that closed after they alerted; they bypass the alert cooldown."""
+        if TELEGRAM_SPREAD_CLOSED:
+            for post in format_closed_spreads_for_telegram(closed):
+                self.send(post)
 
-async def send_telegram_message(text: str):
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
-        print("❌ Missing TELEGRAM_BOT_TOKEN or CHAT_ID in .env")
-        return
+    def _next_message(self):
+        """Pop queued posts into one message of at most TELEGRAM_MAX_MESSAGE_LENGTH characters."""
+        parts = [self.pending.popleft()]
+        length = len(parts[0])
+        while self.pending and length + 1 + len(self.pending[0]) <= TELEGRAM_MAX_MESSAGE_LENGTH:
+            parts.append(self.pending.popleft())
+            length += 1 + len(parts[-1])
+        return "\n".join(parts)
 
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    payload = {
-        "chat_id": TELEGRAM_CHAT_ID,
-        "text": text,
-        "parse_mode": "Markdown",
-        "disable_web_page_preview": True
-    }
+    async def _deliver(self, text):
+        payload = {
+            "chat_id": self.chat_id,
+            "text": text,
+            "parse_mode": "Markdown",
+            "disable_web_page_preview": True
+        }
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            try:
+                async with self.http.post(self.url, json=payload) as resp:
+                    if resp.status == 200:
+                        self.messages_sent += 1
+                        return
+                    body = await resp.json(content_type=None)
+                    if resp.status == 429:
+                        self.rate_limited += 1
+                        retry_after = body.get("parameters", {}).get("retry_after", TELEGRAM_RETRY_DELAY)
+                        log.warning("⏳ Telegram rate limit hit, retrying in %ss", retry_after)
+                        self.bucket.pause(retry_after)
+                        continue
+                    if resp.status < 500:
+                        self.messages_failed += 1
+                        log.error("❌ Failed to send Telegram message: %s", body)
+                        return
+                    error = body
+            except Exception as e:
+                error = e
 
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, json=payload) as resp:
-            if resp.status != 200:
-                print("❌ Failed to send Telegram message:", await resp.text())
+            if attempt == TELEGRAM_MAX_RETRIES:
+                self.messages_failed += 1
+                log.error("❌ Failed to send Telegram message after %s attempts: %s", attempt + 1, error)
+                return
+            delay = TELEGRAM_RETRY_DELAY * 2 ** attempt
+            attempt += 1
+            log.warning("❌ Failed to send Telegram message, retrying in %ss: %s", delay, error)
+            await asyncio.sleep(delay)
 
+    async def run(self):
+        if not self.enabled:
+            log.error("❌ Missing TELEGRAM_BOT_TOKEN or CHAT_ID in .env")
+            return
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            while self.pending:
+                # Posts queued while waiting for a slot are merged into the same message
+                await self.bucket.wait()
+                await self._deliver(self._next_message())
 
 def format_number(x, precision=8):
     if isinstance(x, (int, float)):
@@ -45,7 +165,7 @@ def format_diff_for_telegram(diff_table, top_n_feeds=None):
     Telegram-friendly table
     
     Args:
-        diff_table: output from find_price_diff_table() or find_funding_diff_table()
+        diff_table: output of one of the find_*_table() functions in diffs.py
         top_n_feeds: int or None, limit number of feeds shown per token
     """
     posts = []
@@ -62,6 +182,42 @@ def format_diff_for_telegram(diff_table, top_n_feeds=None):
         if top_n_feeds:
             feeds = feeds[:top_n_feeds]
 
+        if sort_by == "executable":
+            lines.append(f"{token} (EXECUTABLE {token_data['spreadPct']:.2f}%: buy {token_data['buy']}, sell {token_data['sell']})\n")
+            header_fmt = "{:<8}  {:<10} {:<10} {:>8}"
+            lines.append(header_fmt.format("Source", "Bid", "Ask", "ΔSell%"))
+
+            row_fmt = "{:<8} {:<10} {:<10} {:>8}"
+            for f in feeds:
+                lines.append(row_fmt.format(
+                    f["feed"],
+                    f"{format_number(f['bid'], precision=6)}",
+                    f"{format_number(f['ask'], precision=6)}",
+                    f"{format_number(f['sellDiffPct'], precision=2)}%"
+                ))
+            lines.append("")
+            posts.append("```\n" + "\n".join(lines) + "\n```")
+            continue
+
+        if sort_by == "carry":
+            settles_at = datetime.fromtimestamp(token_data["settlesAt"] / 1000, timezone.utc).strftime("%H:%M UTC")
+            lines.append(f"{token} (sorted by CARRY until {settles_at})\n")
+            header_fmt = "{:<8}  {:<10} {:>3} {:>8} {:>8}"
+            lines.append(header_fmt.format("Source", "Price", "N", "Carry%", "ΔCarry%"))
+
+            row_fmt = "{:<8} {:<10}   {:>3} {:>8} {:>8}"
+            for f in feeds:
+                lines.append(row_fmt.format(
+                    f["feed"],
+                    f"{format_number(f['price'], precision=6)}",
+                    f["settlements"],
+                    f"{format_number(f['carryPct'], precision=4)}%",
+                    f"{format_number(f['carryDiffPct'], precision=4)}%"
+                ))
+            lines.append("")
+            posts.append("```\n" + "\n".join(lines) + "\n```")
+            continue
+
         # Header
         lines.append(f"{token} (sorted by {sort_by.upper()})\n")
         header_fmt = "{:<8}  {:<10} {:>6} {:>10}"
@@ -82,12 +238,26 @@ def format_diff_for_telegram(diff_table, top_n_feeds=None):
 
     return posts
 
+def format_closed_spreads_for_telegram(closed, rows_per_post=40):
+    """Posts listing spreads reported closed by SpreadTracker, each well within one message."""
+    header_fmt = "{:<10} {:<10} {:>8} {:>7} {:>7}"
+    posts = []
+    for start in range(0, len(closed), rows_per_post):
+        lines = ["Spreads closed\n", header_fmt.format("Token", "Kind", "Open", "Peak%", "Mean%")]
+        for token_data in closed[start:start + rows_per_post]:
+            lines.append(header_fmt.format(
+                token_data["token"],
+                token_data["sortBy"],
+                format_duration(token_data["durationSec"]),
+                f"{token_data['peakPct']:.2f}",
+                f"{token_data['meanPct']:.2f}",
+            ))
+        posts.append("```\n" + "\n".join(lines) + "\n```")
+    return posts
 
-async def send_detailed_diff_telegram_message(diff_table):
-    """Send detailed diff table as a Telegram message."""
-    if not diff_table:
-        return
-
-    posts = format_diff_for_telegram(diff_table)
-    for post in posts:    
-      await send_telegram_message(post)
+def format_duration(seconds):
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f}m"
+    return f"{seconds / 3600:.1f}h"
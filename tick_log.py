@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+
+import numpy as np
+from dotenv import load_dotenv
+
+from metrics import metrics
+
+load_dotenv()
+
+log = logging.getLogger(__name__)
+
+TICK_LOG_BUFFER_SIZE = int(os.getenv("TICK_LOG_BUFFER_SIZE", 65536))        # ticks held in memory between writes, oldest overwritten when writes fall behind
+TICK_LOG_FLUSH_INTERVAL = float(os.getenv("TICK_LOG_FLUSH_INTERVAL", 1))    # seconds between background writes
+ROTATE_SECONDS = 3600                      # one directory of column files per UTC hour
+
+# One fixed-width record per tick, stored column by column
+TICK_DTYPE = np.dtype([
+    ("t", "<f8"),                          # wall-clock receive time, seconds
+    ("instrument", "<i4"),                 # instrument id, named in the directory's symbols.json
+    ("price", "<f8"),
+    ("funding_rate", "<f8"),
+    ("next_funding_time", "<f8"),
+    ("bid", "<f8"),
+    ("ask", "<f8"),
+])
+TICK_FIELDS = TICK_DTYPE.names[2:]         # values taken from a feed write, NaN when it does not carry them
+
+NAN = float("nan")
+
+_tick_logs = weakref.WeakSet()             # live logs, read when metrics are scraped
+
+def _collect_logs(attribute):
+    return lambda: [({"exchange": tick_log.exchange}, getattr(tick_log, attribute)) for tick_log in _tick_logs]
+
+metrics.collect("tick_log_written_total", "counter", "Ticks written to the tick log", _collect_logs("written"))
+metrics.collect("tick_log_dropped_total", "counter", "Ticks overwritten in the tick log buffer before they were written", _collect_logs("dropped"))
+
+def hour_directory(directory, exchange, hour):
+    return os.path.join(directory, exchange, time.strftime("%Y%m%d%H", time.gmtime(hour * ROTATE_SECONDS)))
+
+class TickLog:
+    """
+    Append-only columnar log of one feed's ticks, for backtests and spread persistence studies.
+
+    append() writes the tick into a preallocated ring buffer and returns; a background
+    thread writes what accumulated every flush_interval seconds as one append per column
+    file, so the event loop never waits on disk. Ticks land in
+    <directory>/<exchange>/<YYYYmmddHH>/ by their UTC hour: one raw little-endian file
+    per TICK_DTYPE field (<field>.bin) and symbols.json, the instrument id -> symbol
+    table, since ids are state store rows and differ between runs. read_ticks() maps
+    such a directory with np.memmap.
+
+    When writes fall more than buffer_size ticks behind, the oldest are overwritten and
+    counted in `dropped`.
+    """
+
+    def __init__(self, directory, exchange, symbols, buffer_size=TICK_LOG_BUFFER_SIZE, flush_interval=TICK_LOG_FLUSH_INTERVAL):
+        self.directory = directory
+        self.exchange = exchange
+        self.symbols = symbols             # instrument id -> symbol, e.g. the store's symbols list
+        self.size = buffer_size
+        self.flush_interval = flush_interval
+        self.buffer = np.zeros(buffer_size, TICK_DTYPE)
+        self.head = 0                      # ticks appended
+        self.tail = 0                      # ticks written or dropped
+        self.written = 0
+        self.dropped = 0
+        self.saved_symbols = {}            # hour directory -> symbols saved to it
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"ticks[{exchange}]", daemon=True)
+        self.thread.start()
+        _tick_logs.add(self)
+
+    def append(self, instrument, fields):
+        """Log the TICK_FIELDS among a feed write's fields; writes carrying none of them are skipped."""
+        get = fields.get
+        price, funding_rate, next_funding_time, bid, ask = get("price"), get("funding_rate"), get("next_funding_time"), get("bid"), get("ask")
+        if price is None and funding_rate is None and next_funding_time is None and bid is None and ask is None:
+            return
+        self.buffer[self.head % self.size] = (
+            time.time(),
+            instrument,
+            NAN if price is None else price,
+            NAN if funding_rate is None else funding_rate,
+            NAN if next_funding_time is None else next_funding_time,
+            NAN if bid is None else bid,
+            NAN if ask is None else ask,
+        )
+        self.head += 1
+
+    def flush(self):
+        """Write ticks appended since the last flush; runs on the writer thread."""
+        head = self.head
+        start = max(self.tail, head - self.size)
+        self.dropped += start - self.tail
+        self.tail = head
+        if head == start:
+            return
+        batch = self.buffer[np.arange(start, head) % self.size]
+        # Slots the event loop refilled while they were copied hold newer ticks, drop them
+        overrun = self.head - self.size - start
+        if overrun > 0:
+            batch = batch[overrun:]
+            self.dropped += overrun
+
+        hours = (batch["t"] // ROTATE_SECONDS).astype(np.int64)
+        for hour in np.unique(hours):
+            ticks = batch[hours == hour]
+            try:
+                self._write(hour_directory(self.directory, self.exchange, int(hour)), ticks)
+            except OSError as e:
+                log.error("❌ Failed to write %s ticks of %s: %s", len(ticks), self.exchange, e)
+                self.dropped += len(ticks)
+                continue
+            self.written += len(ticks)
+
+    def _write(self, path, ticks):
+        os.makedirs(path, exist_ok=True)
+        # Names first, so every id a reader finds in the columns can be resolved
+        symbols = list(self.symbols)
+        if len(symbols) > self.saved_symbols.get(path, 0):
+            tmp_path = os.path.join(path, "symbols.json.tmp")
+            with open(tmp_path, "w") as file:
+                json.dump(symbols, file)
+            os.replace(tmp_path, os.path.join(path, "symbols.json"))
+            self.saved_symbols[path] = len(symbols)
+        for field in TICK_DTYPE.names:
+            with open(os.path.join(path, f"{field}.bin"), "ab") as file:
+                file.write(ticks[field].tobytes())
+
+    def _run(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def close(self):
+        """Stop the writer thread after writing everything appended."""
+        self.stopped.set()
+        self.thread.join()
+
+def tick_directories(directory, exchange):
+    """Hour directories of one exchange's tick log, oldest first."""
+    path = os.path.join(directory, exchange)
+    if not os.path.isdir(path):
+        return []
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))]
+
+def read_ticks(path):
+    """
+    ({field: array}, symbols) for one hour directory.
+
+    Columns are read-only np.memmap views of the files, cut to the ticks every column
+    holds (a crash can leave the last write partial). symbols maps instrument ids to names.
+    """
+    with open(os.path.join(path, "symbols.json")) as file:
+        symbols = json.load(file)
+    files = {field: os.path.join(path, f"{field}.bin") for field in TICK_DTYPE.names}
+    count = min(os.path.getsize(file) // TICK_DTYPE[field].itemsize for field, file in files.items())
+    if count == 0:
+        return {field: np.empty(0, TICK_DTYPE[field]) for field in TICK_DTYPE.names}, symbols
+    return {field: np.memmap(file, TICK_DTYPE[field], mode="r", shape=(count,)) for field, file in files.items()}, symbols
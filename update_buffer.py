@@ -0,0 +1,56 @@
+import asyncio
+
+class UpdateBuffer:
+    """
+    Conflating buffer between feed parsers and the state store.
+
+    Pending writes are keyed by (exchange, instrument id). A newer write merges into the pending
+    one, so only the latest value of each field is applied. The consumer task run() applies
+    everything pending as one batch whenever the parsers yield to the event loop. A burst
+    of frames therefore costs one store write per instrument, not one per frame.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+        # Metrics
+        self.received = 0
+        self.applied = 0
+        self.batches = 0
+
+    def put(self, exchange, instrument, fields):
+        self.received += 1
+        pending = self.pending.get((exchange, instrument))
+        if pending is None:
+            self.pending[(exchange, instrument)] = fields
+        else:
+            pending.update(fields)
+        self.ready.set()
+
+    def contains(self, exchange, instrument):
+        return (exchange, instrument) in self.pending or self.store.contains(exchange, instrument)
+
+    def discard_exchange(self, exchange):
+        self.pending = {key: fields for key, fields in self.pending.items() if key[0] != exchange}
+
+    def flush(self):
+        if not self.pending:
+            return 0
+        batch, self.pending = self.pending, {}
+        for (exchange, instrument), fields in batch.items():
+            self.store.update(exchange, instrument, **fields)
+        self.applied += len(batch)
+        self.batches += 1
+        return len(batch)
+
+    @property
+    def conflated(self):
+        return self.received - self.applied - len(self.pending)
+
+    async def run(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            self.flush()